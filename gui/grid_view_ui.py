@@ -0,0 +1,220 @@
+"""
+gui/grid_view_ui.py
+
+范围回测结果的热力图窗口。数据直接来自结果库 (tool.resultStore)，
+勾选"实时刷新"后会定时增量读取新写入的结果，回测进行中即可观察参数网格。
+"""
+import os
+import tkinter as tk
+from tkinter import filedialog, messagebox
+from typing import Optional
+
+import pandas as pd
+import ttkbootstrap as ttk
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from tool.resultStore import ResultStore, METRIC_COLUMNS, DEFAULT_DB_PATH
+from tool.gridView import GridAccumulator, AGGREGATIONS, draw_heatmap, refresh_heatmap, render_png, render_html
+
+POLL_INTERVAL_MS = 1000
+
+
+class GridViewWindow(ttk.Toplevel):
+    """
+    热力图窗口：选择批量回测、指标、两个参数轴及聚合方式（或固定其余参数做切片）。
+    """
+
+    def __init__(self, master, store_path: str = DEFAULT_DB_PATH):
+        super().__init__(master)
+        self.title('范围回测结果热力图')
+        self.geometry('900x700')
+
+        self.store = ResultStore(store_path)
+        self.df = pd.DataFrame()
+        self.last_id = 0
+        self.acc: Optional[GridAccumulator] = None
+        self.image = None
+        self.colorbar = None
+        self._loaded_run: Optional[str] = None
+        self._latest_run: Optional[str] = None
+
+        # --- 控件 ---
+        ctrl = ttk.Frame(self, padding=10)
+        ctrl.pack(fill='x')
+
+        ttk.Label(ctrl, text='批量回测:').grid(row=0, column=0, sticky='w')
+        self.run_var = tk.StringVar()
+        self.run_combo = ttk.Combobox(ctrl, textvariable=self.run_var, state='readonly', width=40)
+        self.run_combo.grid(row=0, column=1, columnspan=3, sticky='ew', padx=5)
+        self.run_combo.bind('<<ComboboxSelected>>', self.on_run_select)
+
+        ttk.Label(ctrl, text='指标:').grid(row=0, column=4, sticky='w', padx=(10, 0))
+        self.metric_var = tk.StringVar(value='Return [%]')
+        metric_combo = ttk.Combobox(ctrl, textvariable=self.metric_var, state='readonly', values=list(METRIC_COLUMNS), width=18)
+        metric_combo.grid(row=0, column=5, sticky='w', padx=5)
+        metric_combo.bind('<<ComboboxSelected>>', lambda e: self.rebuild())
+
+        ttk.Label(ctrl, text='X 轴:').grid(row=1, column=0, sticky='w', pady=(8, 0))
+        self.x_var = tk.StringVar()
+        self.x_combo = ttk.Combobox(ctrl, textvariable=self.x_var, state='readonly', width=14)
+        self.x_combo.grid(row=1, column=1, sticky='w', padx=5, pady=(8, 0))
+
+        ttk.Label(ctrl, text='Y 轴:').grid(row=1, column=2, sticky='w', pady=(8, 0))
+        self.y_var = tk.StringVar()
+        self.y_combo = ttk.Combobox(ctrl, textvariable=self.y_var, state='readonly', width=14)
+        self.y_combo.grid(row=1, column=3, sticky='w', padx=5, pady=(8, 0))
+
+        ttk.Label(ctrl, text='其余参数:').grid(row=1, column=4, sticky='w', padx=(10, 0), pady=(8, 0))
+        self.agg_var = tk.StringVar(value='max')
+        agg_combo = ttk.Combobox(ctrl, textvariable=self.agg_var, state='readonly', values=list(AGGREGATIONS), width=8)
+        agg_combo.grid(row=1, column=5, sticky='w', padx=5, pady=(8, 0))
+
+        ttk.Label(ctrl, text='固定切片:').grid(row=2, column=0, sticky='w', pady=(8, 0))
+        self.fix_entry = ttk.Entry(ctrl, width=30)
+        self.fix_entry.grid(row=2, column=1, columnspan=2, sticky='w', padx=5, pady=(8, 0))
+        ttk.Label(ctrl, text='例如 atr2=3.0，多个用逗号分隔', bootstyle='secondary').grid(row=2, column=3, columnspan=2, sticky='w', pady=(8, 0))
+
+        for combo in (self.x_combo, self.y_combo, agg_combo):
+            combo.bind('<<ComboboxSelected>>', lambda e: self.rebuild())
+        self.fix_entry.bind('<Return>', lambda e: self.rebuild())
+
+        btns = ttk.Frame(ctrl)
+        btns.grid(row=3, column=0, columnspan=6, sticky='w', pady=(10, 0))
+        self.live_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(btns, text='实时刷新', variable=self.live_var, bootstyle='round-toggle').pack(side='left')
+        self.follow_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(btns, text='跟随最新回测', variable=self.follow_var, bootstyle='round-toggle').pack(side='left', padx=10)
+        ttk.Button(btns, text='导出 PNG/HTML', command=self.export, bootstyle='info-outline').pack(side='left', padx=10)
+        self.info_var = tk.StringVar()
+        ttk.Label(btns, textvariable=self.info_var, bootstyle='secondary').pack(side='left', padx=10)
+
+        # --- 图表 ---
+        self.figure = Figure(figsize=(8, 5), dpi=100)
+        self.ax = self.figure.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self)
+        self.canvas.get_tk_widget().pack(fill='both', expand=True)
+
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
+        self.refresh_runs()
+        self.load_run()
+        self._poll_id = self.after(POLL_INTERVAL_MS, self.poll)
+
+    def refresh_runs(self):
+        runs = self.store.runs()
+        self._latest_run = runs['run_id'].iloc[-1] if not runs.empty else None
+        values = list(runs['run_id'] + ' | ' + runs['dataset']) if not runs.empty else []
+        self.run_combo['values'] = values
+        if values and (not self.run_var.get() or self.follow_var.get()):
+            self.run_var.set(values[-1])
+
+    def on_run_select(self, event=None):
+        # 手动选择历史回测后不再自动跳到最新一次
+        self.follow_var.set(False)
+        self.load_run()
+
+    def current_run_id(self) -> Optional[str]:
+        value = self.run_var.get()
+        return value.split(' | ')[0] if value else None
+
+    def load_run(self):
+        """读取选中批量回测的全部结果并重建热力图。"""
+        run_id = self.current_run_id()
+        if not run_id:
+            return
+        self.df = self.store.load_run(run_id)
+        self.last_id = int(self.df['id'].max()) if not self.df.empty else 0
+        self._loaded_run = run_id
+        self._set_axes()
+        self.rebuild()
+
+    def _set_axes(self):
+        """按已读取结果中的参数列设置 X / Y 轴的候选项。"""
+        params = [c for c in self.df.columns if c != 'id' and c not in METRIC_COLUMNS]
+        self.x_combo['values'] = params
+        self.y_combo['values'] = params
+        if self.x_var.get() not in params and params:
+            self.x_var.set(params[0])
+        if self.y_var.get() not in params and len(params) > 1:
+            self.y_var.set(params[1])
+
+    def _parse_fixed(self):
+        fixed = {}
+        for item in self.fix_entry.get().split(','):
+            if '=' in item:
+                name, value = item.split('=', 1)
+                fixed[name.strip()] = float(value)
+        return fixed
+
+    def rebuild(self):
+        """参数轴、指标或切片发生变化时，从已读取的结果重新累加并重画。"""
+        if not self.x_var.get() or not self.y_var.get():
+            return
+        try:
+            fixed = self._parse_fixed()
+        except ValueError:
+            messagebox.showwarning('输入错误', '固定切片格式应为 参数=数值，例如 atr2=3.0', parent=self)
+            return
+        self.acc = GridAccumulator(self.x_var.get(), self.y_var.get(), self.metric_var.get(), self.agg_var.get(), fixed)
+        self.acc.update(self.df)
+
+        self.figure.clf()
+        self.ax = self.figure.add_subplot(111)
+        self.image = draw_heatmap(self.ax, self.acc)
+        self.colorbar = self.figure.colorbar(self.image, ax=self.ax, label=self.acc.metric)
+        self.canvas.draw_idle()
+        self._update_info()
+
+    def poll(self):
+        """实时刷新：增量读取新结果，只更新新增的格子。"""
+        try:
+            if self.live_var.get():
+                if self.follow_var.get():
+                    # 每次只查最新一次回测，出现新的回测时才刷新下拉列表
+                    latest = self.store.latest_run()
+                    if latest is not None and latest[0] != self._latest_run:
+                        self.refresh_runs()
+                    if self.current_run_id() != self._loaded_run:
+                        self.load_run()
+                run_id = self.current_run_id()
+                if run_id:
+                    new_rows = self.store.load_run(run_id, since_id=self.last_id)
+                    if not new_rows.empty:
+                        self.last_id = int(new_rows['id'].max())
+                        first_rows = self.df.empty
+                        self.df = pd.concat([self.df, new_rows], ignore_index=True)
+                        if self.acc is None or first_rows:
+                            # 回测刚开始时还没有结果（参数轴未知），有数据后按已读取的全部结果建图
+                            self._set_axes()
+                            self.rebuild()
+                        else:
+                            reshaped = self.acc.update(new_rows)
+                            refresh_heatmap(self.image, self.acc, reshaped)
+                            self.canvas.draw_idle()
+                            self._update_info()
+        finally:
+            self._poll_id = self.after(POLL_INTERVAL_MS, self.poll)
+
+    def _update_info(self):
+        if self.acc is not None:
+            self.info_var.set(f'{self.acc.n_points} 个组合 | 网格 {len(self.acc.y_values)} × {len(self.acc.x_values)}')
+
+    def export(self):
+        if self.acc is None or self.acc.n_points == 0:
+            messagebox.showwarning('无数据', '当前没有可导出的结果。', parent=self)
+            return
+        path = filedialog.asksaveasfilename(
+            parent=self, initialdir=os.path.join(os.getcwd(), 'result', 'many'), defaultextension='.html',
+            filetypes=[('HTML', '*.html'), ('PNG', '*.png')])
+        if not path:
+            return
+        if path.lower().endswith('.png'):
+            render_png(self.acc, path)
+        else:
+            render_html(self.acc, self.df, path)
+        self.info_var.set(f'已导出: {path}')
+
+    def on_close(self):
+        self.after_cancel(self._poll_id)
+        self.store.close()
+        self.destroy()
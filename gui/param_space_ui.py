@@ -0,0 +1,119 @@
+"""
+gui/param_space_ui.py
+
+通用策略参数界面：根据 config.json 中声明的参数空间 (tool.paramSpace) 自动生成
+单次回测和范围回测两个选项卡，新策略不需要再手写 Tk 界面和参数解析。
+"""
+from typing import Dict, Any
+import tkinter as tk
+import ttkbootstrap as ttk
+from tkinter import messagebox
+
+from gui.base_ui import BaseStrategyUI
+from tool.paramSpace import ParamSpace
+
+# 分时段统计选项（tool.periodStats），自定义窗口可通过 run_sweep / 命令行 --period 使用
+PERIOD_CHOICES = {'不统计': None, '按月': 'M', '按季': 'Q', '按年': 'Y'}
+
+
+class ParamSpaceUI(BaseStrategyUI):
+    """
+    按参数声明生成输入框：单次回测填写单个值，范围回测填写范围或列表（格式见 tool.paramSpace）。
+    """
+    def __init__(self, master: ttk.Notebook, space: ParamSpace):
+        super().__init__(master)
+        self.space = space
+        self.create_frames()
+
+        self.master.add(self.single_frame, text='  单次回测  ')
+        self.master.add(self.grid_frame, text='  范围回测  ')
+
+    def create_frames(self):
+        """创建单次回测和范围回测的参数Frame。"""
+
+        # --- 单次回测UI ---
+        single_tab = ttk.Frame(self.master, padding=15)
+        self.single_entries: Dict[str, ttk.Entry] = {}
+        for row, spec in enumerate(self.space.params):
+            ttk.Label(single_tab, text=f"{spec.get('label', spec['name'])}:").grid(row=row, column=0, sticky='w', pady=5)
+            entry = ttk.Entry(single_tab, width=12)
+            entry.insert(0, str(spec['default']))
+            entry.grid(row=row, column=1, sticky='w', pady=5)
+            self.single_entries[spec['name']] = entry
+
+        row = len(self.space.params)
+        ttk.Label(single_tab, text='分时段统计:').grid(row=row, column=0, sticky='w', pady=5)
+        self.single_period_var = tk.StringVar(value='不统计')
+        ttk.Combobox(single_tab, textvariable=self.single_period_var, values=list(PERIOD_CHOICES), state='readonly', width=10).grid(row=row, column=1, sticky='w', pady=5)
+
+        self.save_single_trades_var = tk.BooleanVar(value=False)
+        save_check = ttk.Checkbutton(single_tab, text='保存详细交易记录 (至 result/once)', variable=self.save_single_trades_var, bootstyle='round-toggle')
+        save_check.grid(row=row + 1, column=0, columnspan=2, sticky='w', pady=10)
+
+        # --- 范围回测UI ---
+        grid_tab = ttk.Frame(self.master, padding=15)
+        self.range_entries: Dict[str, ttk.Entry] = {}
+        for row, spec in enumerate(self.space.params):
+            ttk.Label(grid_tab, text=f"{spec.get('label', spec['name'])}:").grid(row=row, column=0, sticky='w', pady=5)
+            entry = ttk.Entry(grid_tab, width=30)
+            entry.insert(0, spec.get('range', str(spec['default'])))
+            entry.grid(row=row, column=1, sticky='w', pady=5)
+            hint = '格式: 1-50 或 1,2,3' if spec.get('type') == 'int' else '格式: 1,2,3 或 0.5-3:0.5'
+            ttk.Label(grid_tab, text=hint, bootstyle='secondary').grid(row=row, column=2, sticky='w', padx=10)
+            self.range_entries[spec['name']] = entry
+
+        row = len(self.space.params)
+        ttk.Label(grid_tab, text='并行进程数:').grid(row=row, column=0, sticky='w', pady=5)
+        self.workers_var = tk.IntVar(value=1)
+        ttk.Spinbox(grid_tab, from_=1, to=64, textvariable=self.workers_var, width=6).grid(row=row, column=1, sticky='w', pady=5)
+
+        row += 1
+        ttk.Label(grid_tab, text='分时段稳定性:').grid(row=row, column=0, sticky='w', pady=5)
+        self.grid_period_var = tk.StringVar(value='不统计')
+        ttk.Combobox(grid_tab, textvariable=self.grid_period_var, values=list(PERIOD_CHOICES), state='readonly', width=10).grid(row=row, column=1, sticky='w', pady=5)
+        ttk.Label(grid_tab, text='另存按稳定性排序的各时段收益表', bootstyle='secondary').grid(row=row, column=2, sticky='w', padx=10)
+
+        self.save_grid_summary_var = tk.BooleanVar(value=True)
+        save_check = ttk.Checkbutton(grid_tab, text='保存范围回测总结 (至 result/many)', variable=self.save_grid_summary_var, bootstyle='round-toggle')
+        save_check.grid(row=row + 1, column=0, columnspan=2, sticky='w', pady=(10, 0))
+
+        self.resume_var = tk.BooleanVar(value=True)
+        resume_check = ttk.Checkbutton(grid_tab, text='从上次中断处继续', variable=self.resume_var, bootstyle='round-toggle')
+        resume_check.grid(row=row + 2, column=0, columnspan=2, sticky='w', pady=(10, 0))
+
+        # 策略配置了 fast_evaluate_func 时才提供快速撮合内核选项
+        self.fast_var = tk.BooleanVar(value=False)
+        if 'fast_evaluate_func' in self.space.config:
+            fast_check = ttk.Checkbutton(grid_tab, text='快速撮合内核 (不经过 backtesting.py，统计量较少)', variable=self.fast_var, bootstyle='round-toggle')
+            fast_check.grid(row=row + 3, column=0, columnspan=2, sticky='w', pady=10)
+
+        self.single_frame = single_tab
+        self.grid_frame = grid_tab
+
+    def get_single_run_params(self) -> Dict[str, Any]:
+        """按参数声明顺序收集单次回测的参数值。"""
+        try:
+            params = {name: self.space.cast(name, entry.get()) for name, entry in self.single_entries.items()}
+        except ValueError as e:
+            messagebox.showwarning('输入错误', str(e))
+            return None
+        params['save_trades'] = self.save_single_trades_var.get()
+        params['period'] = PERIOD_CHOICES[self.single_period_var.get()]
+        return params
+
+    def get_grid_search_params(self) -> Dict[str, Any]:
+        """收集范围回测的参数取值和执行选项，作为 tool.sweepRunner.run_sweep 的参数。"""
+        try:
+            values = {name: self.space.parse_values(name, entry.get()) for name, entry in self.range_entries.items()}
+            workers = max(1, int(self.workers_var.get()))
+        except (ValueError, tk.TclError) as e:
+            messagebox.showwarning('输入错误', f'范围或列表参数格式不正确: {e}')
+            return None
+        return {
+            'values': values,
+            'save_summary': self.save_grid_summary_var.get(),
+            'workers': workers,
+            'resume': self.resume_var.get(),
+            'fast': self.fast_var.get(),
+            'period': PERIOD_CHOICES[self.grid_period_var.get()],
+        }
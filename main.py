@@ -12,6 +12,12 @@ from ttkbootstrap.constants import *
 
 import json
 import importlib
+import functools
+
+from gui.grid_view_ui import GridViewWindow
+from gui.param_space_ui import ParamSpaceUI
+from tool.paramSpace import ParamSpace
+from tool.sweepRunner import run_sweep, run_single
 
 # --- 动态策略注册 ---
 def load_strategy_registry():
@@ -26,25 +32,38 @@ def load_strategy_registry():
                 continue
 
             name = strategy_config['name']
+            # 声明了参数空间 (params) 的策略，未单独指定的UI和执行函数使用通用实现
+            space = ParamSpace(strategy_config) if 'params' in strategy_config else None
             
             # 动态导入UI类
-            ui_module = importlib.import_module(strategy_config['ui_module'])
-            ui_class = getattr(ui_module, strategy_config['ui_class'])
+            if 'ui_class' in strategy_config:
+                ui_module = importlib.import_module(strategy_config['ui_module'])
+                ui_class = getattr(ui_module, strategy_config['ui_class'])
+            else:
+                ui_class = functools.partial(ParamSpaceUI, space=space)
             
             # 动态导入逻辑函数
             logic_module = importlib.import_module(strategy_config['logic_module'])
-            single_run_func = getattr(logic_module, strategy_config['single_run_func'])
-            batch_run_func = getattr(logic_module, strategy_config['batch_run_func'])
+            if 'single_run_func' in strategy_config:
+                single_run_func = getattr(logic_module, strategy_config['single_run_func'])
+            else:
+                single_run_func = functools.partial(run_single, space)
+            if 'batch_run_func' in strategy_config:
+                batch_run_func = getattr(logic_module, strategy_config['batch_run_func'])
+            else:
+                batch_run_func = functools.partial(run_sweep, space)
 
             registry[name] = {
                 "ui": ui_class,
                 "logic": {
                     "single": single_run_func,
                     "batch": batch_run_func,
-                }
+                },
+                # 通用执行器直接接收 UI 返回的参数字典（见 start_grid）
+                "generic_batch": 'batch_run_func' not in strategy_config,
             }
         return registry, config.get('app_settings', {})
-    except (FileNotFoundError, json.JSONDecodeError, ImportError, AttributeError) as e:
+    except (FileNotFoundError, json.JSONDecodeError, ImportError, AttributeError, KeyError, ValueError) as e:
         messagebox.showerror("配置错误", f"加载 config.json 或策略模块失败: {e}")
         return {}, {}
 
@@ -108,6 +127,10 @@ class MainApp:
         self.open_folder_button = ttk.Button(action_frame, text='打开结果目录', command=self.open_result_folder, bootstyle='info-outline', width=15)
         self.open_folder_button.pack(side=LEFT)
 
+        # 热力图窗口在回测过程中也可打开，用于实时观察范围回测结果
+        self.heatmap_button = ttk.Button(action_frame, text='结果热力图', command=self.open_grid_view, bootstyle='info-outline', width=12)
+        self.heatmap_button.pack(side=LEFT, padx=(5, 0))
+
         self.status_var = tk.StringVar(value='就绪')
         self.status_label = ttk.Label(action_frame, textvariable=self.status_var, anchor='e')
         self.status_label.pack(side=RIGHT, fill=X, expand=YES)
@@ -239,6 +262,13 @@ class MainApp:
         except Exception as e:
             self._log(f"错误: 无法打开文件夹 {path} - {e}")
 
+    def open_grid_view(self):
+        store_path = os.path.join(APP_SETTINGS.get('results_directory', 'result'), 'results.db')
+        try:
+            GridViewWindow(self.root, store_path)
+        except Exception as e:
+            self._log(f"错误: 无法打开结果热力图 - {e}")
+
     def start_single(self, params: dict):
         csv_name = self.csv_var.get().strip()
         if not csv_name:
@@ -258,6 +288,9 @@ class MainApp:
         # 从 params 中移除已经处理过的 save_trades，避免重复传递
         clean_params = params.copy()
         clean_params.pop('save_trades', None)
+        # 分时段统计（通用参数界面提供）同样作为关键字参数传递
+        if 'period' in clean_params:
+            thread_kwargs['period'] = clean_params.pop('period')
         
         thread_args = (csv_name,) + tuple(clean_params.values())
 
@@ -297,6 +330,13 @@ class MainApp:
         
         self._set_running(True, '正在运行范围回测...')
 
+        # 通用执行器 (run_sweep) 直接接收UI给出的参数取值和执行选项
+        if STRATEGY_REGISTRY[strategy_name]["generic_batch"]:
+            thread_kwargs = dict(params, stop_event=self.stop_event, log_queue=self.log_queue)
+            t = threading.Thread(target=self._run_grid_thread, args=(logic_func, (csv_name,), thread_kwargs), daemon=True)
+            t.start()
+            return
+
         # 准备线程参数
         thread_kwargs = {'plot': False, 'stop_event': self.stop_event, 'log_queue': self.log_queue}
         
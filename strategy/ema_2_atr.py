@@ -8,15 +8,80 @@ import queue
 from backtesting import Backtest, Strategy as BTStrategy
 import numpy as np
 
-from tool.dataDeal import clean_csv_to_backtesting
+from tool.dataDeal import prepare_cleaned_csv, _log
+from tool.resultStore import DEFAULT_DB_PATH
+from tool.dataCache import load_ohlcv, reset_peak_rss, peak_rss_mb
+from tool.sweepRunner import run_sweep, save_grid_summary as _save_grid_summary
+from tool.fillKernel import simulate_fills
+from tool.periodStats import period_stats, stability_summary
+
+STRATEGY_NAME = 'EMA_2ATR'
+PARAM_NAMES = ['ema_period', 'atr1', 'atr2']
+
+# --- 指标与信号（同时支持 1D 单品种和 2D 时间×品种数组） ---
+
+def ema_indicator(close: np.ndarray, period: int) -> np.ndarray:
+    """EMA 中轴。2D 输入时按列（每个品种）独立计算。"""
+    out = pd.DataFrame(close).ewm(span=period, adjust=False).mean().to_numpy()
+    return out.reshape(np.shape(close))
+
+def atr_indicator(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+    """ATR（真实波幅的简单移动平均）。2D 输入时按列独立计算。"""
+    prev_close = np.roll(close, 1, axis=0)
+    h_l = high - low
+    h_pc = np.abs(high - prev_close)
+    l_pc = np.abs(low - prev_close)
+    tr = np.maximum.reduce([h_l, h_pc, l_pc])
+    out = pd.DataFrame(tr).rolling(window=period, min_periods=1).mean().to_numpy()
+    return out.reshape(np.shape(close))
+
+def _shift(a: np.ndarray, n: int) -> np.ndarray:
+    """沿时间轴后移 n 根 K 线，前 n 行填 NaN。"""
+    out = np.full(np.shape(a), np.nan)
+    out[n:] = a[:-n]
+    return out
+
+def compute_signals(
+    open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray,
+    ema: np.ndarray, atr: np.ndarray, atr1: float, atr2: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    向量化计算 CustomStrategy.next 的开仓条件。
 
-def _log_to_queue(log_queue: Optional[queue.Queue], msg: str):
-    """如果提供了队列，则向其发送日志消息。"""
-    if log_queue:
-        ts = datetime.datetime.now().strftime('%H:%M:%S')
-        log_queue.put(f'[{ts}] {msg}')
-    else:
-        print(msg)
+    第 i 行的结果等价于 next() 在第 i 根 K 线收盘时的判断（k2=i-2, k1=i-1, k0=i），
+    返回 (long, short, sl, tp)：多/空信号布尔数组，以及对应的止损、止盈价（无信号处为 NaN）。
+    """
+    k2_open, k2_close = _shift(open_, 2), _shift(close, 2)
+    k2_high, k2_low, k2_vol = _shift(high, 2), _shift(low, 2), _shift(volume, 2)
+    k1_open, k1_close, k1_vol = _shift(open_, 1), _shift(close, 1), _shift(volume, 1)
+    ema_k2, atr_k2 = _shift(ema, 2), _shift(atr, 2)
+    ema_k1, atr_k1 = _shift(ema, 1), _shift(atr, 1)
+
+    atr2_val = atr2 * atr_k2
+    vol_ok = k1_vol <= k2_vol / 2
+
+    long_setup = (k2_high > ema_k2 + atr2_val) & (k2_close > k2_open) & (k1_close < k1_open) & vol_ok
+    short_setup = (k2_low < ema_k2 - atr2_val) & (k2_close < k2_open) & (k1_close > k1_open) & vol_ok
+    # next() 中多头条件优先（if/elif）
+    short_setup &= ~long_setup
+
+    long_sl = ema_k1 - atr_k1 * atr1
+    short_sl = ema_k1 + atr_k1 * atr1
+    sl = np.where(long_setup, long_sl, np.where(short_setup, short_sl, np.nan))
+    tp = 2 * close - sl
+
+    # 与 next() 相同的有效性检查: sl < entry < tp（多）/ tp < entry < sl（空）
+    long_sig = long_setup & (sl < close) & (close < tp)
+    short_sig = short_setup & (tp < close) & (close < sl)
+    valid = long_sig | short_sig
+    return long_sig, short_sig, np.where(valid, sl, np.nan), np.where(valid, tp, np.nan)
+
+def _cached_indicator(func, value: np.ndarray):
+    """返回与 func 同名、直接给出预先计算结果的指标函数，backtesting 中的指标名称保持不变。"""
+    def cached(*args):
+        return value
+    cached.__name__ = func.__name__
+    return cached
 
 # --- 核心策略逻辑 ---
 
@@ -28,18 +93,15 @@ class CustomStrategy(BTStrategy):
     ema_period: int = 38
     atr1: float = 1.0
     atr2: float = 2.0
+    # 通用执行器 (tool.sweepRunner) 预先算好并缓存的指标 {'ema': ..., 'atr': ...}，未提供时在 init 中计算
+    indicators: Optional[Dict[str, np.ndarray]] = None
 
     def init(self):
-        self.ema = self.I(lambda x: pd.Series(x).ewm(span=self.ema_period, adjust=False).mean(), self.data.Close)
-
-        def atr_func(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
-            h_l = high - low
-            h_pc = np.abs(high - np.roll(close, 1))
-            l_pc = np.abs(low - np.roll(close, 1))
-            tr = np.maximum.reduce([h_l, h_pc, l_pc])
-            return pd.Series(tr).rolling(window=self.ema_period, min_periods=1).mean().values
-
-        self.atr = self.I(atr_func, self.data.High, self.data.Low, self.data.Close)
+        pre = self.indicators or {}
+        ema_func = _cached_indicator(ema_indicator, pre['ema']) if 'ema' in pre else ema_indicator
+        atr_func = _cached_indicator(atr_indicator, pre['atr']) if 'atr' in pre else atr_indicator
+        self.ema = self.I(ema_func, self.data.Close, self.ema_period)
+        self.atr = self.I(atr_func, self.data.High, self.data.Low, self.data.Close, self.ema_period)
 
     def next(self):
         if len(self.data.Close) < 3:
@@ -85,9 +147,20 @@ class CustomStrategy(BTStrategy):
 
 # --- 回测应用封装 ---
 
-def apply_backtest(df: pd.DataFrame, ema_period: int, atr1: float, atr2: float, cash: int = 100000, plot: bool = True, stop_event: Optional[threading.Event] = None) -> Optional[Tuple[Dict[str, Any], pd.DataFrame]]:
+def _effective_cash(df: pd.DataFrame, cash: int) -> int:
+    """backtesting 按整数手下单，资金不足价格的 10 倍时放大到 100 倍，保证能买得起。"""
+    try:
+        max_price = max(df['High'].max(), df['Close'].max())
+        if cash < max_price * 10:
+            cash = max(cash, int(max_price * 100))
+    except Exception:
+        pass
+    return cash
+
+def apply_backtest(df: pd.DataFrame, ema_period: int, atr1: float, atr2: float, cash: int = 100000, plot: bool = True, stop_event: Optional[threading.Event] = None, indicators: Optional[Dict[str, np.ndarray]] = None) -> Optional[Tuple[Dict[str, Any], pd.DataFrame]]:
     """
     使用 backtesting 库回测策略并返回统计结果和交易记录。
+    indicators 为预先计算好的指标（见 CustomStrategy.indicators），可省去重复计算。
     """
     def make_strategy(ema_period: int, atr1: float, atr2: float):
         class ParamStrategy(CustomStrategy):
@@ -95,20 +168,17 @@ def apply_backtest(df: pd.DataFrame, ema_period: int, atr1: float, atr2: float,
         ParamStrategy.ema_period = ema_period
         ParamStrategy.atr1 = atr1
         ParamStrategy.atr2 = atr2
+        ParamStrategy.indicators = indicators
         return ParamStrategy
 
-    df2 = df.copy()
+    # 不复制行情数据：已是 DatetimeIndex 的数据（如 load_ohlcv 的内存映射）直接使用，
+    # 带 Date 列的数据只新建索引，各列仍引用原数组
+    df2 = df
     if 'Date' in df2.columns:
-        df2.index = pd.to_datetime(df2['Date'])
-        df2 = df2.drop(columns=['Date'])
-
-    try:
-        max_price = max(df2['High'].max(), df2['Close'].max())
-        if cash < max_price * 10:
-            cash = max(cash, int(max_price * 100))
-    except Exception:
-        pass
+        index = pd.DatetimeIndex(pd.to_datetime(df2['Date']))
+        df2 = pd.DataFrame({c: df2[c].to_numpy() for c in df2.columns if c != 'Date'}, index=index, copy=False)
 
+    cash = _effective_cash(df2, cash)
     bt = Backtest(df2, make_strategy(ema_period, atr1, atr2), cash=cash)
     try:
         # 注意：backtesting.py 本身不支持在 .run() 中中止，
@@ -137,37 +207,34 @@ def run_single_backtest(
     plot: bool = False, 
     save_trades: bool = False,
     stop_event: Optional[threading.Event] = None,
-    log_queue: Optional[queue.Queue] = None
+    log_queue: Optional[queue.Queue] = None,
+    dtype: str = 'float64',
+    period: Optional[str] = None
 ) -> Optional[Dict[str, Any]]:
     """
     执行单次回测。
+    数据通过内存映射缓存加载（dtype 可选 float32 以减半内存），
+    统计结果中附带本次回测的峰值内存 'Peak RSS [MB]'。
+    period（'M'、'Q' 等，见 tool.periodStats）给出时，用这一次回测的权益曲线和交易记录计算分时段统计，
+    稳定性指标并入统计结果，各时段明细保存为 result/once/periods_*.csv。
     """
-    _log_to_queue(log_queue, f"开始处理: EMA={ema_period}, ATR1={atr1}, ATR2={atr2}")
-    input_path = f'data/no/{csv_name}.csv'
-    output_dir = 'data/ok'
-    cleaned_name = f'{csv_name}-ok.csv'
-    cleaned_path = os.path.join(output_dir, cleaned_name)
-
-    if not os.path.isfile(cleaned_path):
-        try:
-            if stop_event and stop_event.is_set(): return None
-            _log_to_queue(log_queue, f"清洗数据: {input_path}")
-            temp_cleaned = clean_csv_to_backtesting(input_path, output_dir)
-            os.rename(temp_cleaned, cleaned_path)
-            _log_to_queue(log_queue, f'数据清洗完成: {cleaned_path}')
-        except Exception as e:
-            _log_to_queue(log_queue, f'数据清洗失败: {e}')
-            return None
+    _log(log_queue, f"开始处理: EMA={ema_period}, ATR1={atr1}, ATR2={atr2}")
+    cleaned_path = prepare_cleaned_csv(csv_name, stop_event, log_queue)
+    if cleaned_path is None:
+        return None
     
+    reset_peak_rss()
     try:
         if stop_event and stop_event.is_set(): return None
-        df = pd.read_csv(cleaned_path)
+        df = load_ohlcv(cleaned_path, dtype)
     except Exception as e:
-        _log_to_queue(log_queue, f'读取清洗数据失败: {e}')
+        _log(log_queue, f'读取清洗数据失败: {e}')
         return None
 
     if stop_event and stop_event.is_set(): return None
     stats, trades = apply_backtest(df, ema_period, atr1, atr2, plot=plot, stop_event=stop_event)
+    if stats is not None:
+        stats.loc['Peak RSS [MB]'] = peak_rss_mb()
 
     if stats is not None and save_trades and trades is not None and not trades.empty:
         ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -175,10 +242,72 @@ def run_single_backtest(
         output_path = os.path.join('result', 'once', filename)
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         trades.to_csv(output_path)
-        _log_to_queue(log_queue, f"交易记录已保存: {os.path.abspath(output_path)}")
+        _log(log_queue, f"交易记录已保存: {os.path.abspath(output_path)}")
+
+    if stats is not None and period:
+        table = period_stats(stats['_equity_curve']['Equity'], trades, period)
+        for key, value in stability_summary(table).items():
+            stats.loc[key] = value
+        _log(log_queue, '分时段统计:\n' + table.drop(columns=['Start', 'End']).round(2).to_string())
+        ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_path = os.path.join('result', 'once', f'periods_{csv_name}_ema{ema_period}_atr{atr1}-{atr2}_{ts}.csv')
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        table.to_csv(output_path)
+        _log(log_queue, f"分时段统计已保存: {os.path.abspath(output_path)}")
 
     return stats
 
+def evaluate(df: pd.DataFrame, params: Dict[str, Any], indicators: Optional[Dict[str, np.ndarray]] = None) -> Optional[Dict[str, Any]]:
+    """
+    通用执行器 (tool.sweepRunner) 的评估接口，在 config.json 中登记为 evaluate_func。
+    只返回标量统计（不含 _trades 等大对象）；逐笔收益率以 '_trade_returns' 附带，
+    执行器只在需要稳健性分析时保留（且只保留排名靠前的组合），不写入汇总和结果库。
+    逐根权益 '_equity' 和精简的交易记录 '_trades' 供分时段统计 (tool.periodStats) 使用，执行器用完即丢弃。
+    """
+    stats, trades = apply_backtest(df, params['ema_period'], params['atr1'], params['atr2'], plot=False, indicators=indicators)
+    if stats is None:
+        return None
+    stats_dict = {k: v for k, v in stats.items() if not str(k).startswith('_')}
+    stats_dict['_trade_returns'] = trades['ReturnPct'].to_numpy()
+    stats_dict['_equity'] = stats['_equity_curve']['Equity'].to_numpy()
+    stats_dict['_trades'] = trades[['ExitTime', 'PnL', 'ReturnPct']]
+    return stats_dict
+
+def evaluate_fast(df: pd.DataFrame, params: Dict[str, Any], indicators: Optional[Dict[str, np.ndarray]] = None, cash: int = 100000) -> Optional[Dict[str, Any]]:
+    """
+    evaluate 的快速版本，在 config.json 中登记为 fast_evaluate_func。
+    信号由 compute_signals 向量化计算，成交 / 出场由 tool.fillKernel 模拟（有 numba 时为编译循环），
+    不经过 backtesting.py，交易记录和权益与 evaluate 一致，但不计算 Sharpe 等其余统计量。
+    """
+    ema_period, atr1, atr2 = params['ema_period'], params['atr1'], params['atr2']
+    open_, high, low, close, volume = (df[c].to_numpy(dtype=np.float64) for c in ['Open', 'High', 'Low', 'Close', 'Volume'])
+    pre = indicators or {}
+    ema = pre['ema'] if 'ema' in pre else ema_indicator(close, ema_period)
+    atr = pre['atr'] if 'atr' in pre else atr_indicator(high, low, close, ema_period)
+    long_sig, short_sig, sl, tp = compute_signals(open_, high, low, close, volume, ema, atr, atr1, atr2)
+    # backtesting 从所有指标都有值的下一根才开始调用 next()
+    warmup = max(int(np.argmax(~np.isnan(ema))), int(np.argmax(~np.isnan(atr))))
+    direction = long_sig.astype(np.float64) - short_sig
+    direction[:warmup + 1] = 0
+
+    cash = _effective_cash(df, cash)
+    trades, equity = simulate_fills(open_, high, low, close, direction, sl, tp, cash)
+    peak = np.maximum.accumulate(equity)
+    n_trades = len(trades['pnl'])
+    return {
+        'Start': df.index[0],
+        'End': df.index[-1],
+        'Equity Final [$]': equity[-1],
+        'Equity Peak [$]': peak.max(),
+        'Return [%]': (equity[-1] - cash) / cash * 100,
+        'Max. Drawdown [%]': (equity / peak - 1).min() * 100,
+        '# Trades': n_trades,
+        'Win Rate [%]': (trades['pnl'] > 0).mean() * 100 if n_trades else np.nan,
+        '_trade_returns': trades['return_pct'],
+        '_equity': equity,
+        '_trades': pd.DataFrame({'ExitTime': df.index[trades['exit_bar']], 'PnL': trades['pnl'], 'ReturnPct': trades['return_pct']}),
+    }
+
 def run_batch_backtest(
     csv_name: str, 
     ema_range: List[int], 
@@ -187,67 +316,44 @@ def run_batch_backtest(
     plot: bool = False, # 这个plot参数实际上没有被使用
     save_summary: bool = True,
     stop_event: Optional[threading.Event] = None,
-    log_queue: Optional[queue.Queue] = None
+    log_queue: Optional[queue.Queue] = None,
+    store_path: Optional[str] = DEFAULT_DB_PATH,
+    workers: int = 1,
+    dtype: str = 'float64',
+    resume: bool = True,
+    fast: bool = False,
+    period: Optional[str] = None,
+    period_rank: str = 'Period Stability',
+    robustness_top: int = 0,
+    robustness_metric: str = 'Return [%]',
+    robustness_sims: int = 5000,
+    robustness_method: str = 'bootstrap'
 ):
     """
-    执行批量回测。
+    执行批量回测，由通用执行器 tool.sweepRunner.run_sweep 完成（参数空间见 config.json）。
+    每个组合的结果同时写入结果库 store_path（传 None 则不写），便于之后跨批次查询。
+
+    数据只加载一次（内存映射缓存），EMA/ATR 指标按 ema_period 缓存，workers > 1 时用多进程并行。
+    汇总中的 'Peak RSS [MB]' 为每个组合的峰值内存，可据此估算可用的进程数。
+    中止后用相同参数再次运行会从断点继续（resume=False 则重新开始）。
+    fast=True 时用 evaluate_fast（tool.fillKernel 撮合内核）代替 backtesting.py，交易与权益相同，统计量较少。
+    period（'M'、'Q' 等）给出时，每个组合从同一次回测计算分时段稳定性指标，各时段收益表按 period_rank 排序另存。
+
+    robustness_top > 0 时，对按 robustness_metric 排名前 N 的组合做蒙特卡洛稳健性分析
+    （tool.robustness，直接使用回测时保留的逐笔收益，不重新回测），结果另存为 robustness_<时间>.csv。
     """
-    results = []
-    total = len(ema_range) * len(atr1_range) * len(atr2_range)
-    _log_to_queue(log_queue, f'准备运行 {total} 次组合回测...')
-
-    count = 0
-    start_time = datetime.datetime.now()
-
-    for ema_period in ema_range:
-        for atr1 in atr1_range:
-            for atr2 in atr2_range:
-                if stop_event and stop_event.is_set():
-                    _log_to_queue(log_queue, "批量回测被中止。")
-                    return
-
-                count += 1
-                
-                # 时间预测
-                if count > 1:
-                    elapsed = datetime.datetime.now() - start_time
-                    avg_time_per_run = elapsed / (count - 1)
-                    remaining_runs = total - count + 1
-                    eta = avg_time_per_run * remaining_runs
-                    # 将 eta 转换为更易读的格式
-                    eta_str = str(datetime.timedelta(seconds=int(eta.total_seconds())))
-                    status_msg = f'[{count}/{total}] EMA={ema_period}, ATR1={atr1}, ATR2={atr2} | 预计剩余: {eta_str}'
-                else:
-                    status_msg = f'[{count}/{total}] EMA={ema_period}, ATR1={atr1}, ATR2={atr2}'
-                
-                _log_to_queue(log_queue, status_msg)
-
-                stats = run_single_backtest(
-                    csv_name, ema_period, atr1, atr2, 
-                    plot=False, save_trades=False, # 批量回测中不绘图、不单独保存交易
-                    stop_event=stop_event, log_queue=None # 子调用不直接写队列
-                )
-                if stats is not None:
-                    # 将Series转换为dict
-                    stats_dict = stats.to_dict()
-                    stats_dict['ema_period'] = ema_period
-                    stats_dict['atr1'] = atr1
-                    stats_dict['atr2'] = atr2
-                    results.append(stats_dict)
-
-    if results and save_summary:
-        df_result = pd.DataFrame(results)
-        columns = ['ema_period', 'atr1', 'atr2', 'Equity Final [$]', 'Return [%]', '# Trades', 'Win Rate [%]']
-        existing_cols = [c for c in columns if c in df_result.columns]
-        df_simple = df_result[existing_cols]
-        
-        ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_path = f'result/many/grid_summary_{ts}.csv'
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        df_simple.to_csv(output_path, index=False)
-        _log_to_queue(log_queue, f'批量回测结果已保存: {os.path.abspath(output_path)}')
-    elif not (stop_event and stop_event.is_set()):
-        _log_to_queue(log_queue, '没有有效的回测结果。')
+    values = {'ema_period': list(ema_range), 'atr1': list(atr1_range), 'atr2': list(atr2_range)}
+    return run_sweep(
+        STRATEGY_NAME, csv_name, values, save_summary=save_summary, workers=workers, dtype=dtype, resume=resume, fast=fast,
+        period=period, period_rank=period_rank,
+        stop_event=stop_event, log_queue=log_queue, store_path=store_path,
+        robustness_top=robustness_top, robustness_metric=robustness_metric,
+        robustness_sims=robustness_sims, robustness_method=robustness_method,
+    )
+
+def save_grid_summary(results: List[Dict[str, Any]], log_queue: Optional[queue.Queue] = None) -> str:
+    """把批量回测结果保存为 result/many/grid_summary_<时间>.csv，返回文件路径。"""
+    return _save_grid_summary(results, PARAM_NAMES, log_queue)
 
 # --- 主函数入口 ---
 
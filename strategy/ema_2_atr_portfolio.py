@@ -0,0 +1,339 @@
+"""
+ema_2_atr_portfolio.py
+
+EMA_2ATR 策略的多品种组合回测。
+
+所有品种按时间对齐后放在同一组 2D 数组（时间 × 品种）中：指标和开仓信号对整组品种
+一次性向量化计算，逐 K 线的撮合循环只遍历时间轴，每一步同时处理全部品种。
+因此回测 100 个品种的开销远小于 100 次独立的单品种回测。
+
+撮合规则与 backtesting.py 保持一致：
+ - 第 i 根 K 线收盘产生信号，第 i+1 根开盘价成交
+ - 止损优先于止盈判断（同一根 K 线同时触及时按止损处理），跳空时按开盘价成交
+ - 每个品种同一时间最多一笔持仓；持仓期间产生的信号挂到下一根 K 线，若该持仓在那根 K 线
+   先被止损/止盈，挂单随即按开盘价成交，否则撤单（对应 backtesting.py 的保证金不足撤单）
+ - backtesting.py 在整数仓位下偶尔会用剩余资金追加 1 手的小额仓位，组合模式不模拟这种情况
+ - 回测结束时仍未平仓的交易不计入交易记录，但计入权益
+
+资金按"分仓"管理：每个品种拥有独立的资金份额（按 allocation 分配），盈亏只在本分仓内滚动。
+默认允许小数仓位，因此不需要像单品种回测那样把 cash 放大到价格的 100 倍。
+"""
+
+import os
+import re
+import argparse
+import datetime
+import threading
+import queue
+from typing import Optional, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from strategy.ema_2_atr import ema_indicator, atr_indicator, compute_signals
+from tool.dataDeal import prepare_cleaned_csv, _log
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+TRADE_COLUMNS = ['Symbol', 'Size', 'EntryBar', 'ExitBar', 'EntryPrice', 'ExitPrice', 'PnL', 'ReturnPct']
+
+
+def load_panel(
+    csv_names: List[str],
+    stop_event: Optional[threading.Event] = None,
+    log_queue: Optional[queue.Queue] = None
+) -> Optional[Tuple[pd.DatetimeIndex, Dict[str, np.ndarray]]]:
+    """
+    读取多个数据文件并按时间对齐。
+
+    返回 (index, panel)：index 为所有品种时间戳的并集，panel[列名] 为 (时间 × 品种) 的 float 数组，
+    某品种缺失的 K 线为 NaN。
+    """
+    frames = []
+    for name in csv_names:
+        path = prepare_cleaned_csv(name, stop_event, log_queue)
+        if path is None:
+            return None
+        df = pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+        frames.append(df[~df.index.duplicated()])
+
+    index = frames[0].index
+    for df in frames[1:]:
+        index = index.union(df.index)
+
+    panel = {}
+    for col in OHLCV_COLUMNS:
+        panel[col] = np.column_stack([df[col].reindex(index).to_numpy(dtype=float) for df in frames])
+    return index, panel
+
+
+def _allocation_weights(symbols: List[str], allocation: Union[str, Dict[str, float]]) -> np.ndarray:
+    """把 allocation 参数转换为与 symbols 对齐、总和为 1 的权重数组。"""
+    if allocation == 'equal':
+        return np.full(len(symbols), 1.0 / len(symbols))
+    if isinstance(allocation, dict):
+        weights = np.array([float(allocation.get(s, 0.0)) for s in symbols])
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError(f'无效的资金分配权重: {allocation}')
+        return weights / weights.sum()
+    raise ValueError(f"allocation 只支持 'equal' 或 {{品种: 权重}} 字典，收到: {allocation!r}")
+
+
+def simulate_portfolio(
+    index: pd.DatetimeIndex,
+    symbols: List[str],
+    panel: Dict[str, np.ndarray],
+    ema_period: int,
+    atr1: float,
+    atr2: float,
+    cash: float = 100000,
+    allocation: Union[str, Dict[str, float]] = 'equal',
+    fractional: bool = True,
+    stop_event: Optional[threading.Event] = None
+) -> Optional[pd.Series]:
+    """
+    在对齐好的面板数据上运行组合回测，返回与 backtesting.py 字段风格一致的统计结果。
+    """
+    open_, high, low, close, volume = (panel[c] for c in OHLCV_COLUMNS)
+    n_bars, n_sym = close.shape
+
+    ema = ema_indicator(close, ema_period)
+    atr = atr_indicator(high, low, close, ema_period)
+    long_sig, short_sig, sig_sl, sig_tp = compute_signals(open_, high, low, close, volume, ema, atr, atr1, atr2)
+    any_sig = long_sig | short_sig
+    signal_bars = any_sig.any(axis=1)
+    # 缺失 K 线按上一根收盘价估值
+    mark_close = pd.DataFrame(close).ffill().to_numpy()
+
+    sleeve_start = cash * _allocation_weights(symbols, allocation)
+    sleeve_cash = sleeve_start.copy()
+    size = np.zeros(n_sym)
+    entry_price = np.zeros(n_sym)
+    entry_bar = np.zeros(n_sym, dtype=np.int64)
+    pos_sl = np.full(n_sym, np.nan)
+    pos_tp = np.full(n_sym, np.nan)
+    pending = np.zeros(n_sym, dtype=bool)
+    pend_dir = np.zeros(n_sym)
+    pend_sl = np.full(n_sym, np.nan)
+    pend_tp = np.full(n_sym, np.nan)
+
+    equity = np.empty(n_bars)
+    closed: List[Tuple[np.ndarray, ...]] = []
+
+    def close_hits(t: int, candidates: np.ndarray):
+        """对 candidates 中的持仓检查止损/止盈，止损优先，跳空时按开盘价成交。"""
+        o, h, l = open_[t], high[t], low[t]
+        is_long = size > 0
+        sl_hit = candidates & np.where(is_long, l <= pos_sl, h >= pos_sl)
+        tp_hit = candidates & ~sl_hit & np.where(is_long, h >= pos_tp, l <= pos_tp)
+        j = np.flatnonzero(sl_hit | tp_hit)
+        if not j.size:
+            return
+        sl_px = np.where(is_long[j], np.minimum(o[j], pos_sl[j]), np.maximum(o[j], pos_sl[j]))
+        tp_px = np.where(is_long[j], np.maximum(o[j], pos_tp[j]), np.minimum(o[j], pos_tp[j]))
+        exit_px = np.where(sl_hit[j], sl_px, tp_px)
+        pnl = size[j] * (exit_px - entry_price[j])
+        closed.append((j, size[j].copy(), entry_bar[j].copy(), np.full(j.size, t),
+                       entry_price[j].copy(), exit_px, pnl))
+        sleeve_cash[j] += pnl
+        size[j] = 0.0
+
+    for t in range(n_bars):
+        if stop_event and t % 4096 == 0 and stop_event.is_set():
+            return None
+
+        # 1. 已有持仓的止损 / 止盈（backtesting.py 中它们排在新订单之前处理）
+        in_pos = size != 0
+        if in_pos.any():
+            close_hits(t, in_pos)
+
+        # 2. 上一根 K 线的信号在本根开盘成交；仍有持仓的品种撤单，本根缺失的品种继续挂单
+        if pending.any():
+            active = pending & ~np.isnan(open_[t])
+            fill = active & (size == 0)
+            if fill.any():
+                units = sleeve_cash[fill] / open_[t, fill]
+                if not fractional:
+                    units = np.floor(units)
+                ok = np.flatnonzero(fill)[units > 0]
+                size[ok] = pend_dir[ok] * units[units > 0]
+                entry_price[ok] = open_[t, ok]
+                entry_bar[ok] = t
+                pos_sl[ok] = pend_sl[ok]
+                pos_tp[ok] = pend_tp[ok]
+                # 新仓位的止损 / 止盈在开仓当根即可触发
+                opened = np.zeros(n_sym, dtype=bool)
+                opened[ok] = True
+                close_hits(t, opened)
+            pending[active] = False
+
+        # 3. 收盘产生的新信号挂到下一根 K 线
+        if signal_bars[t]:
+            new = any_sig[t]
+            pending[new] = True
+            pend_dir[new] = np.where(long_sig[t, new], 1.0, -1.0)
+            pend_sl[new] = sig_sl[t, new]
+            pend_tp[new] = sig_tp[t, new]
+
+        equity[t] = sleeve_cash.sum() + (size * (mark_close[t] - entry_price))[size != 0].sum()
+
+    trades = _build_trades(closed, symbols, index)
+    sleeve_equity = sleeve_cash + np.where(size != 0, size * (mark_close[-1] - entry_price), 0.0)
+    return _compute_stats(index, symbols, equity, trades, cash, sleeve_equity, sleeve_start)
+
+
+def _build_trades(closed: List[Tuple[np.ndarray, ...]], symbols: List[str], index: pd.DatetimeIndex) -> pd.DataFrame:
+    """把撮合循环中按 K 线收集的平仓记录拼接成交易表。"""
+    if not closed:
+        return pd.DataFrame(columns=TRADE_COLUMNS + ['EntryTime', 'ExitTime'])
+    sym, size, e_bar, x_bar, e_px, x_px, pnl = (np.concatenate(parts) for parts in zip(*closed))
+    trades = pd.DataFrame({
+        'Symbol': np.asarray(symbols, dtype=object)[sym],
+        'Size': size,
+        'EntryBar': e_bar,
+        'ExitBar': x_bar,
+        'EntryPrice': e_px,
+        'ExitPrice': x_px,
+        'PnL': pnl,
+        'ReturnPct': np.sign(size) * (x_px / e_px - 1),
+    })
+    trades['EntryTime'] = index[e_bar]
+    trades['ExitTime'] = index[x_bar]
+    return trades
+
+
+def _compute_stats(
+    index: pd.DatetimeIndex,
+    symbols: List[str],
+    equity: np.ndarray,
+    trades: pd.DataFrame,
+    cash: float,
+    sleeve_equity: np.ndarray,
+    sleeve_start: np.ndarray
+) -> pd.Series:
+    """汇总组合与各品种的统计指标。"""
+    peak = np.maximum.accumulate(equity)
+    drawdown = 1 - equity / peak
+    n_trades = len(trades)
+    win_rate = (trades['PnL'] > 0).mean() * 100 if n_trades else np.nan
+
+    grouped = trades.groupby('Symbol')['PnL']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sym_return = (sleeve_equity / sleeve_start - 1) * 100
+    per_symbol = pd.DataFrame({
+        'Equity Final [$]': sleeve_equity,
+        'Return [%]': sym_return,
+        '# Trades': grouped.size().reindex(symbols, fill_value=0).to_numpy(),
+        'Win Rate [%]': (grouped.apply(lambda p: (p > 0).mean() * 100)).reindex(symbols).to_numpy(),
+    }, index=pd.Index(symbols, name='Symbol'))
+
+    return pd.Series({
+        'Start': index[0],
+        'End': index[-1],
+        'Symbols': len(symbols),
+        'Equity Final [$]': equity[-1],
+        'Equity Peak [$]': peak.max(),
+        'Return [%]': (equity[-1] / cash - 1) * 100,
+        'Max. Drawdown [%]': -drawdown.max() * 100,
+        '# Trades': n_trades,
+        'Win Rate [%]': win_rate,
+        '_equity_curve': pd.DataFrame({'Equity': equity, 'DrawdownPct': drawdown}, index=index),
+        '_trades': trades,
+        '_per_symbol': per_symbol,
+    })
+
+
+# --- 执行器 ---
+
+def run_portfolio_backtest(
+    csv_names: List[str],
+    ema_period: int,
+    atr1: float,
+    atr2: float,
+    cash: float = 100000,
+    allocation: Union[str, Dict[str, float]] = 'equal',
+    fractional: bool = True,
+    save_trades: bool = False,
+    stop_event: Optional[threading.Event] = None,
+    log_queue: Optional[queue.Queue] = None
+) -> Optional[pd.Series]:
+    """
+    对多个数据文件执行一次组合回测。
+
+    参数:
+      - csv_names: data/no 下的文件名（不含扩展名），每个文件视为一个品种
+      - allocation: 'equal' 等权分仓，或 {文件名: 权重} 字典
+      - fractional: 是否允许小数仓位；False 时按整数单位下单（与 backtesting.py 一致）
+    """
+    if not csv_names:
+        _log(log_queue, '没有指定任何品种。')
+        return None
+
+    _log(log_queue, f"开始组合回测: {len(csv_names)} 个品种, EMA={ema_period}, ATR1={atr1}, ATR2={atr2}")
+    loaded = load_panel(csv_names, stop_event, log_queue)
+    if loaded is None:
+        return None
+    index, panel = loaded
+
+    stats = simulate_portfolio(index, csv_names, panel, ema_period, atr1, atr2, cash=cash,
+                               allocation=allocation, fractional=fractional, stop_event=stop_event)
+    if stats is None:
+        return None
+
+    trades = stats['_trades']
+    if save_trades and not trades.empty:
+        ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f'portfolio_trades_{len(csv_names)}sym_ema{ema_period}_atr{atr1}-{atr2}_{ts}.csv'
+        output_path = os.path.join('result', 'once', filename)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        trades.to_csv(output_path, index=False)
+        _log(log_queue, f"交易记录已保存: {os.path.abspath(output_path)}")
+
+    return stats
+
+
+def _common_month_files(data_dir: str = 'data/no') -> List[str]:
+    """
+    在按 <品种>-<周期>-<YYYY-MM>.csv 命名的月度文件中，找出同一周期下品种最多、且各品种都有的最近一个月，
+    返回该月每个品种的文件名（不含扩展名）。
+    """
+    months: Dict[str, Dict[str, set]] = {}
+    for f in os.listdir(data_dir):
+        m = re.fullmatch(r'([A-Z0-9]+)-(\w+)-(\d{4}-\d{2})\.csv', f)
+        if m:
+            symbol, interval, month = m.groups()
+            months.setdefault(interval, {}).setdefault(symbol, set()).add(month)
+    names: List[str] = []
+    for interval, symbols in months.items():
+        common = set.intersection(*symbols.values())
+        if common and len(symbols) > len(names):
+            month = max(common)
+            names = [f'{symbol}-{interval}-{month}' for symbol in sorted(symbols)]
+    return names
+
+
+def main():
+    """
+    直接运行脚本时的示例：对多个不同品种做一次等权组合回测。
+    未指定数据时，取 data/no 中各品种共有的最近一个月的月度文件，每个品种一个。
+    """
+    parser = argparse.ArgumentParser(description='EMA_2ATR 多品种组合回测')
+    parser.add_argument('csv', nargs='*', help='data/no 下的数据文件名（不含扩展名），每个文件是一个不同的品种')
+    parser.add_argument('--ema', type=int, default=9)
+    parser.add_argument('--atr1', type=float, default=3.0)
+    parser.add_argument('--atr2', type=float, default=3.0)
+    args = parser.parse_args()
+
+    names = args.csv or _common_month_files()
+    if len(names) < 2:
+        print('组合回测需要至少两个不同品种的数据，可先下载，例如: '
+              'python -m tool.dataFetch BTCUSDT ETHUSDT SOLUSDT --start 2025-01 --end 2025-06')
+        return
+    stats = run_portfolio_backtest(names, ema_period=args.ema, atr1=args.atr1, atr2=args.atr2)
+    if stats is not None:
+        print(stats.drop(['_equity_curve', '_trades', '_per_symbol']))
+        print(stats['_per_symbol'])
+
+
+if __name__ == '__main__':
+    main()
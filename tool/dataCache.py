@@ -0,0 +1,150 @@
+"""
+dataCache.py
+
+低内存数据通道：把清洗后的 CSV 转换为二进制缓存 (.npy)，之后通过内存映射 (mmap) 只读加载。
+
+ - 每列连续存储为 (5, n) 的数组，构造 DataFrame 时各列直接引用映射内存，不做复制
+ - 可选 float32，行情数据内存占用减半
+ - 多个回测进程映射同一个文件时共享操作系统的页缓存，数据只占一份物理内存
+ - 构建缓存时分块读取 CSV，峰值内存与块大小有关，而不是与文件大小有关
+ - 多个进程同时构建同一份缓存时各写各的临时文件，再原子替换，互不干扰
+
+另外提供峰值内存 (peak RSS) 的测量函数，用于评估每个回测进程的内存需求。
+"""
+
+import os
+import sys
+import uuid
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+DTYPES = ('float64', 'float32')
+
+# 构建缓存时每次读取的行数
+CHUNK_ROWS = 1_000_000
+
+
+def cache_paths(cleaned_csv: str, dtype: str = 'float64') -> Tuple[str, str]:
+    """缓存文件路径：(<name>.<dtype>.npy 行情数组, <name>.index.npy 时间索引)。"""
+    base, _ = os.path.splitext(cleaned_csv)
+    return f'{base}.{dtype}.npy', f'{base}.index.npy'
+
+
+def _is_fresh(cache_path: str, source_path: str) -> bool:
+    return os.path.isfile(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(source_path)
+
+
+def _temp_path(path: str) -> str:
+    """每个构建者独有的临时文件名，避免并发构建时互相覆盖、删除。"""
+    return f'{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp'
+
+
+def _publish(tmp_path: str, path: str, source_path: str):
+    """把临时文件原子地替换为正式缓存。替换失败但其他进程已经写好了新缓存时视为成功。"""
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        if not _is_fresh(path, source_path):
+            raise
+
+
+def build_cache(cleaned_csv: str, dtype: str = 'float64', chunk_rows: int = CHUNK_ROWS) -> Tuple[str, str]:
+    """
+    把清洗后的 CSV（Date, Open, High, Low, Close, Volume）分块写入 .npy 缓存，返回缓存路径。
+    可以被多个进程同时调用：各自写入独有的临时文件，完成后原子替换，结果相同。
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f'不支持的数据类型: {dtype}，可选 {DTYPES}')
+    values_path, index_path = cache_paths(cleaned_csv, dtype)
+
+    with open(cleaned_csv, 'rb') as f:
+        n_rows = sum(1 for _ in f) - 1  # 去掉表头
+
+    values_tmp = _temp_path(values_path)
+    index_tmp = _temp_path(index_path) if not _is_fresh(index_path, cleaned_csv) else None
+    try:
+        values = np.lib.format.open_memmap(values_tmp, mode='w+', dtype=dtype, shape=(len(OHLCV_COLUMNS), n_rows))
+        index = np.lib.format.open_memmap(index_tmp, mode='w+', dtype=np.int64, shape=(n_rows,)) if index_tmp else None
+
+        start = 0
+        for chunk in pd.read_csv(cleaned_csv, usecols=['Date'] + OHLCV_COLUMNS, chunksize=chunk_rows):
+            end = start + len(chunk)
+            for i, col in enumerate(OHLCV_COLUMNS):
+                values[i, start:end] = chunk[col].to_numpy(dtype=dtype)
+            if index is not None:
+                index[start:end] = pd.to_datetime(chunk['Date']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+            start = end
+
+        values.flush()
+        del values
+        _publish(values_tmp, values_path, cleaned_csv)
+        if index is not None:
+            index.flush()
+            del index
+            _publish(index_tmp, index_path, cleaned_csv)
+    finally:
+        # 正常情况下临时文件已被替换掉；出错或其他进程抢先完成时清理残留
+        for tmp in (values_tmp, index_tmp):
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+    return values_path, index_path
+
+
+def load_ohlcv(cleaned_csv: str, dtype: str = 'float64', mmap: bool = True) -> pd.DataFrame:
+    """
+    以 DatetimeIndex + OHLCV 列的形式加载数据，可直接交给 backtesting.Backtest。
+
+    mmap=True 时各列是只读的内存映射视图：不复制数据，且多个进程共享同一份物理内存。
+    缓存不存在或比 CSV 旧时会自动重建。
+    """
+    values_path, index_path = cache_paths(cleaned_csv, dtype)
+    if not (_is_fresh(values_path, cleaned_csv) and _is_fresh(index_path, cleaned_csv)):
+        build_cache(cleaned_csv, dtype)
+
+    mode = 'r' if mmap else None
+    values = np.load(values_path, mmap_mode=mode)
+    index = pd.DatetimeIndex(np.load(index_path, mmap_mode=mode).view('datetime64[ns]'), name='Date')
+    return pd.DataFrame({col: values[i] for i, col in enumerate(OHLCV_COLUMNS)}, index=index, copy=False)
+
+
+# --- 峰值内存 ---
+
+def reset_peak_rss() -> bool:
+    """
+    重置当前进程的峰值内存统计（仅 Linux 支持，写 /proc/self/clear_refs）。
+    成功返回 True；其他平台返回 False，此时 peak_rss_mb 给出的是进程启动以来的峰值。
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值常驻内存 (MB)，无法获取时返回 None。"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 为 KB
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil  # Windows 上的可选依赖
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
@@ -10,6 +10,9 @@ dataDeal.py
 """
 
 import os
+import datetime
+import queue
+import threading
 from typing import Optional, Sequence
 
 import pandas as pd
@@ -25,22 +28,41 @@ def _find_time_column(columns: Sequence[str]) -> Optional[str]:
     return None
 
 
-def clean_csv_to_backtesting(input_path: str, output_dir: str, time_col: Optional[str] = None) -> Optional[str]:
-    """将交易所 CSV 清洗为回测格式并写到 output_dir，返回写入路径。
+# Binance 早期的 kline 文件没有表头，按官方字段顺序补齐
+KLINE_COLUMNS = [
+    'open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time',
+    'quote_volume', 'count', 'taker_buy_volume', 'taker_buy_quote_volume', 'ignore'
+]
 
-    参数:
-      - input_path: 源 CSV 路径
-      - output_dir: 输出目录
-      - time_col: 如果明确知道时间列名可传入，否则自动检测
-    """
-    if not os.path.isfile(input_path):
-        raise FileNotFoundError(f"Input file not found: {input_path}")
 
-    os.makedirs(output_dir, exist_ok=True)
+def _first_line(source) -> str:
+    """读取首行用于判断有无表头；文件对象读完后回到原位置。"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            line = f.readline()
+    else:
+        pos = source.tell()
+        line = source.readline()
+        source.seek(pos)
+    return line.decode('utf-8-sig') if isinstance(line, bytes) else line
+
+
+def read_raw_klines(source) -> pd.DataFrame:
+    """读取原始 kline CSV（路径或可 seek 的文件对象），自动处理无表头的文件。"""
+    first = _first_line(source).split(',')[0].strip()
+    if first.isdigit():
+        # 首行就是数据：不能让 pandas 把它当表头（重复的价格会被改名为 42283.5.1）
+        return pd.read_csv(source, header=None, names=KLINE_COLUMNS)
+    return pd.read_csv(source)
 
-    # 读取 CSV，允许较大的文件
-    df = pd.read_csv(input_path)
 
+def clean_kline_frame(df: pd.DataFrame, time_col: Optional[str] = None) -> pd.DataFrame:
+    """把原始 kline DataFrame 清洗为回测格式（Date, Open, High, Low, Close, Volume）。
+
+    参数:
+      - df: 原始行情 DataFrame
+      - time_col: 如果明确知道时间列名可传入，否则自动检测
+    """
     # 自动检测时间列
     if time_col is None:
         time_col = _find_time_column(df.columns)
@@ -49,9 +71,9 @@ def clean_csv_to_backtesting(input_path: str, output_dir: str, time_col: Optiona
 
     # 将时间戳转换为 datetime，优先尝试毫秒级(ms)，失败再尝试秒级(s)
     try:
-        df['Date'] = pd.to_datetime(df[time_col], unit='ms', utc=True)
+        dates = pd.to_datetime(df[time_col], unit='ms', utc=True)
     except Exception:
-        df['Date'] = pd.to_datetime(df[time_col], unit='s', utc=True)
+        dates = pd.to_datetime(df[time_col], unit='s', utc=True)
 
     # 需要的列映射
     col_map = {
@@ -66,12 +88,65 @@ def clean_csv_to_backtesting(input_path: str, output_dir: str, time_col: Optiona
     if missing:
         raise ValueError(f"缺少必要行情列: {missing}")
 
-    out_df = df[['Date'] + list(col_map.keys())].copy()
-    out_df = out_df.rename(columns=col_map)
-    out_df['Date'] = out_df['Date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    out_df = df[list(col_map.keys())].rename(columns=col_map)
+    out_df.insert(0, 'Date', dates.dt.strftime('%Y-%m-%d %H:%M:%S'))
+    return out_df
+
+
+def clean_csv_to_backtesting(input_path: str, output_dir: str, time_col: Optional[str] = None) -> Optional[str]:
+    """将交易所 CSV 清洗为回测格式并写到 output_dir，返回写入路径。
+
+    参数:
+      - input_path: 源 CSV 路径
+      - output_dir: 输出目录
+      - time_col: 如果明确知道时间列名可传入，否则自动检测
+    """
+    if not os.path.isfile(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 读取 CSV，允许较大的文件
+    df = read_raw_klines(input_path)
+    out_df = clean_kline_frame(df, time_col)
 
     base = os.path.basename(input_path)
     name, _ = os.path.splitext(base)
     out_path = os.path.join(output_dir, f"{name}_cleaned.csv")
     out_df.to_csv(out_path, index=False)
     return out_path
+
+
+def _log(log_queue: Optional[queue.Queue], msg: str):
+    """如果提供了队列，则向其发送日志消息，否则直接打印。"""
+    if log_queue:
+        ts = datetime.datetime.now().strftime('%H:%M:%S')
+        log_queue.put(f'[{ts}] {msg}')
+    else:
+        print(msg)
+
+
+def prepare_cleaned_csv(
+    csv_name: str,
+    stop_event: Optional[threading.Event] = None,
+    log_queue: Optional[queue.Queue] = None
+) -> Optional[str]:
+    """
+    返回 data/ok 下清洗后的数据路径，不存在时先清洗 data/no 下的原始数据。
+    """
+    input_path = f'data/no/{csv_name}.csv'
+    output_dir = 'data/ok'
+    cleaned_name = f'{csv_name}-ok.csv'
+    cleaned_path = os.path.join(output_dir, cleaned_name)
+
+    if not os.path.isfile(cleaned_path):
+        try:
+            if stop_event and stop_event.is_set(): return None
+            _log(log_queue, f"清洗数据: {input_path}")
+            temp_cleaned = clean_csv_to_backtesting(input_path, output_dir)
+            os.rename(temp_cleaned, cleaned_path)
+            _log(log_queue, f'数据清洗完成: {cleaned_path}')
+        except Exception as e:
+            _log(log_queue, f'数据清洗失败: {e}')
+            return None
+    return cleaned_path
@@ -0,0 +1,266 @@
+"""
+dataFetch.py
+
+行情下载工具：并发下载 Binance 公开数据站 (data.binance.vision) 的月度 kline 压缩包，
+在内存中解压后直接交给 dataDeal 的清洗流程，不产生任何临时文件。
+
+主要功能：
+ - 基于 asyncio + aiohttp 连接池，同时下载多个交易对、多个月份
+ - 令牌桶限速与失败重试（指数退避，遵守 Retry-After）
+ - 原始 CSV 写入 data/no，清洗结果写入 data/ok/<name>-ok.csv（与回测模块的缓存约定一致）
+ - base_url 可替换，便于指向本地的模拟 HTTP 服务进行测试
+
+命令行示例：
+    python -m tool.dataFetch BTCUSDT ETHUSDT --interval 15m --start 2024-01 --end 2025-08
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import queue
+import threading
+import time
+import zipfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from tool.dataDeal import clean_kline_frame, read_raw_klines, _log
+
+BASE_URL = 'https://data.binance.vision'
+
+# 不同市场在数据站上的月度 kline 路径
+MARKET_PATHS = {
+    'um': 'data/futures/um/monthly/klines',
+    'cm': 'data/futures/cm/monthly/klines',
+    'spot': 'data/spot/monthly/klines',
+}
+
+# 这些状态码视为临时错误，会重试
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def month_range(start: str, end: str) -> List[str]:
+    """生成 [start, end] 之间（含两端）的月份列表，格式 YYYY-MM。"""
+    y, m = map(int, start.split('-'))
+    end_y, end_m = map(int, end.split('-'))
+    months = []
+    while (y, m) <= (end_y, end_m):
+        months.append(f'{y:04d}-{m:02d}')
+        m += 1
+        if m > 12:
+            y, m = y + 1, 1
+    return months
+
+
+def kline_name(symbol: str, interval: str, month: str) -> str:
+    """数据站的文件名（不含扩展名），例如 BTCUSDT-15m-2024-01。"""
+    return f'{symbol}-{interval}-{month}'
+
+
+def kline_url(symbol: str, interval: str, month: str, base_url: str = BASE_URL, market: str = 'um') -> str:
+    """拼接月度 kline 压缩包的下载地址。"""
+    path = MARKET_PATHS[market]
+    name = kline_name(symbol, interval, month)
+    return f"{base_url.rstrip('/')}/{path}/{symbol}/{interval}/{name}.zip"
+
+
+class RateLimiter:
+    """简单的异步令牌桶：平均每秒最多放行 rate 个请求，允许 burst 个突发。"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _extract_csv(payload: bytes) -> bytes:
+    """从下载内容中取出 CSV 字节：zip 包取第一个 csv 成员，否则原样返回。"""
+    buf = io.BytesIO(payload)
+    if not zipfile.is_zipfile(buf):
+        return payload
+    with zipfile.ZipFile(buf) as zf:
+        members = [n for n in zf.namelist() if n.lower().endswith('.csv')]
+        if not members:
+            raise ValueError('压缩包中没有 CSV 文件')
+        return zf.read(members[0])
+
+
+def _process_payload(payload: bytes, name: str, raw_dir: Optional[str], ok_dir: str) -> str:
+    """解压、清洗并写出结果，返回清洗后文件路径。在线程池中执行，避免阻塞事件循环。"""
+    raw = _extract_csv(payload)
+    if raw_dir:
+        os.makedirs(raw_dir, exist_ok=True)
+        with open(os.path.join(raw_dir, f'{name}.csv'), 'wb') as f:
+            f.write(raw)
+
+    out_df = clean_kline_frame(read_raw_klines(io.BytesIO(raw)))
+    os.makedirs(ok_dir, exist_ok=True)
+    out_path = os.path.join(ok_dir, f'{name}-ok.csv')
+    out_df.to_csv(out_path, index=False)
+    return out_path
+
+
+async def _fetch_bytes(
+    session: aiohttp.ClientSession,
+    url: str,
+    limiter: RateLimiter,
+    retries: int,
+    backoff: float,
+) -> Optional[bytes]:
+    """带限速和重试的 GET。404 返回 None（该月份尚未发布）。"""
+    attempt = 0
+    while True:
+        await limiter.acquire()
+        delay = backoff * (2 ** attempt)
+        try:
+            async with session.get(url) as resp:
+                if resp.status == 404:
+                    return None
+                if resp.status in RETRY_STATUS:
+                    retry_after = resp.headers.get('Retry-After')
+                    if retry_after and retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+                    raise aiohttp.ClientResponseError(
+                        resp.request_info, resp.history, status=resp.status, message=resp.reason or '')
+                resp.raise_for_status()
+                return await resp.read()
+        except aiohttp.ClientResponseError as e:
+            if e.status not in RETRY_STATUS or attempt >= retries:
+                raise
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt >= retries:
+                raise
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def fetch_klines(
+    symbols: Iterable[str],
+    interval: str,
+    months: Iterable[str],
+    raw_dir: Optional[str] = 'data/no',
+    ok_dir: str = 'data/ok',
+    base_url: str = BASE_URL,
+    market: str = 'um',
+    concurrency: int = 8,
+    rate_limit: float = 10.0,
+    retries: int = 3,
+    backoff: float = 0.5,
+    timeout: float = 60.0,
+    overwrite: bool = False,
+    session: Optional[aiohttp.ClientSession] = None,
+    stop_event: Optional[threading.Event] = None,
+    log_queue: Optional[queue.Queue] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    并发下载并清洗多个交易对、多个月份的 kline 数据。
+
+    参数:
+      - raw_dir: 原始 CSV 的保存目录，传 None 则只保存清洗结果
+      - concurrency: 同时进行的下载数，同时也是连接池大小
+      - rate_limit: 每秒最多发起的请求数，<= 0 表示不限速
+      - session: 可传入已有的 ClientSession（例如测试时复用）
+    返回:
+      - {文件名: 清洗后路径}，下载失败或数据不存在的为 None
+    """
+    # 月份会对每个交易对遍历一次，先转成列表，避免传入生成器时只有第一个交易对有月份
+    months = list(months)
+    tasks: List[Tuple[str, str]] = []
+    results: Dict[str, Optional[str]] = {}
+    for symbol in symbols:
+        for month in months:
+            name = kline_name(symbol, interval, month)
+            ok_path = os.path.join(ok_dir, f'{name}-ok.csv')
+            if not overwrite and os.path.isfile(ok_path):
+                results[name] = ok_path
+                continue
+            tasks.append((name, kline_url(symbol, interval, month, base_url, market)))
+
+    if not tasks:
+        _log(log_queue, '所有数据均已存在，无需下载。')
+        return results
+
+    _log(log_queue, f'准备下载 {len(tasks)} 个文件 (并发 {concurrency}, 限速 {rate_limit}/s)...')
+    limiter = RateLimiter(rate_limit, burst=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def worker(sess: aiohttp.ClientSession, name: str, url: str):
+        nonlocal done
+        async with semaphore:
+            if stop_event and stop_event.is_set():
+                results[name] = None
+                return
+            try:
+                payload = await _fetch_bytes(sess, url, limiter, retries, backoff)
+                if payload is None:
+                    _log(log_queue, f'数据不存在，跳过: {name}')
+                    results[name] = None
+                else:
+                    results[name] = await asyncio.to_thread(_process_payload, payload, name, raw_dir, ok_dir)
+            except Exception as e:
+                _log(log_queue, f'下载失败: {name} - {e}')
+                results[name] = None
+            done += 1
+            _log(log_queue, f'[{done}/{len(tasks)}] {name}')
+
+    own_session = session is None
+    if own_session:
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
+    try:
+        await asyncio.gather(*(worker(session, name, url) for name, url in tasks))
+    finally:
+        if own_session:
+            await session.close()
+
+    ok_count = sum(1 for name, _ in tasks if results.get(name))
+    _log(log_queue, f'下载完成: 成功 {ok_count}/{len(tasks)}')
+    return results
+
+
+def download_klines(*args, **kwargs) -> Dict[str, Optional[str]]:
+    """fetch_klines 的同步封装，参数相同。适合在脚本或后台线程中直接调用。"""
+    return asyncio.run(fetch_klines(*args, **kwargs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发下载 Binance 月度 kline 数据并清洗为回测格式')
+    parser.add_argument('symbols', nargs='+', help='交易对，例如 BTCUSDT ETHUSDT')
+    parser.add_argument('--interval', default='15m')
+    parser.add_argument('--start', required=True, help='起始月份 YYYY-MM')
+    parser.add_argument('--end', required=True, help='结束月份 YYYY-MM')
+    parser.add_argument('--market', default='um', choices=sorted(MARKET_PATHS))
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate-limit', type=float, default=10.0)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--overwrite', action='store_true')
+    args = parser.parse_args()
+
+    download_klines(
+        args.symbols, args.interval, month_range(args.start, args.end),
+        base_url=args.base_url, market=args.market, concurrency=args.concurrency,
+        rate_limit=args.rate_limit, retries=args.retries, overwrite=args.overwrite,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,509 @@
+"""
+distributedSweep.py
+
+范围回测的分布式执行：一台机器运行协调器 (coordinator)，其他机器运行 worker。
+适用于任何在 config.json 中声明了参数空间 (tool.paramSpace) 的策略，评估方式与 tool.sweepRunner 相同。
+
+ - 协调器用 ParamSpace.build_grid 生成参数网格，按指标依赖切成若干分片 (shard)，通过一个简单的 HTTP/JSON 接口分发
+ - worker 从 /job 取得策略配置，导入其 logic_module，用 evaluate_func（快速模式下为 fast_evaluate_func）
+   和指标缓存逐个回测；worker 所在机器需要有同一份策略代码
+ - worker 主动领取分片（租约），回测完成后把结果回传；计算期间定时发送心跳续租
+ - worker 掉线（租约超时未续）时，分片重新排队交给其他 worker；迟到的重复结果会被忽略
+ - 数据集按内容的 sha256 标识，worker 本地缓存 (data/cache/<sha256>.csv)，同一份数据只下载一次
+ - 结果边到达边写入结果库，全部完成后按与 run_sweep 相同的格式保存 grid_summary CSV（给出 period 时另存分时段收益表）
+ - 只回传标量统计和各时段收益，不回传逐笔收益率，不支持稳健性分析
+ - 默认只监听 127.0.0.1；监听其他地址时所有请求都需带共享令牌 (X-Token 头)，未指定令牌时自动生成并输出到日志。
+   分片结果只接受当前租约持有者提交，租约超时后才接受其他 worker 的迟到结果
+
+接口（均为 JSON，数据集下载除外）:
+    GET  /job                 当前任务：数据集名称、sha256、大小、数据类型、策略配置、评估函数名、时段划分
+    GET  /dataset/<sha256>    下载清洗后的数据 CSV
+    POST /lease               {"worker"} -> {"shard", "params"} | {"wait": 秒} | {"done": true}
+    POST /heartbeat           {"worker", "shard"} -> {"ok"}
+    POST /result              {"worker", "shard", "results": [{"params", "stats"}]} -> {"ok"}
+    令牌不符时返回 403。
+
+本机测试时可以用 local_workers 在本地启动若干 worker 进程代替远程机器。
+
+用法:
+    python -m tool.distributedSweep coordinator EMA_2ATR btc_usdt_24-至今 --set ema_period=10-50 --set atr1=1,1.5,2 --local-workers 2
+    python -m tool.distributedSweep coordinator EMA_2ATR btc_usdt_24-至今 --host 0.0.0.0 --token <令牌> --set ema_period=10-50
+    python -m tool.distributedSweep worker --url http://<协调器IP>:8765 --token <令牌>
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import secrets
+import argparse
+import datetime
+import threading
+import queue
+import urllib.request
+import urllib.error
+import multiprocessing
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+import pandas as pd
+
+from tool.paramSpace import ParamSpace
+from tool.dataDeal import prepare_cleaned_csv, _log
+from tool.resultStore import ResultStore, DEFAULT_DB_PATH
+from tool.periodStats import period_codes
+from tool.sweepRunner import (_resolve_space, _evaluate_func_name, _chunk_grid, _init_worker, _evaluate_chunk,
+                              _json_stats, save_grid_summary, save_period_summary)
+
+DEFAULT_PORT = 8765
+DEFAULT_HOST = '127.0.0.1'
+TOKEN_HEADER = 'X-Token'
+DEFAULT_CACHE_DIR = 'data/cache'
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# --- 协调器 ---
+
+class Coordinator:
+    """
+    分片队列 + 租约表。所有状态由一把锁保护，HTTP 处理线程只读写这些内存结构；
+    回传的结果放入 results_queue，由 run_distributed_sweep 的主线程统一写入结果库（sqlite 连接不跨线程）。
+    """
+
+    def __init__(self, cleaned_path: str, dataset: str, space: ParamSpace, grid: List[Dict[str, Any]],
+                 evaluate_func: str, shard_size: int = 20, lease_timeout: float = 60.0, dtype: str = 'float64',
+                 period: Optional[Union[str, List[str]]] = None, token: Optional[str] = None):
+        self.cleaned_path = cleaned_path
+        self.token = token
+        self.dataset = dataset
+        self.space = space
+        self.evaluate_func = evaluate_func
+        self.dtype = dtype
+        self.period = period
+        self.sha256 = file_sha256(cleaned_path)
+        self.size = os.path.getsize(cleaned_path)
+        self.lease_timeout = lease_timeout
+
+        # 与本机多进程相同，按指标依赖切分，同一分片内的组合共享指标
+        self.shards = _chunk_grid(space, grid, shard_size)
+        self.pending = deque(range(len(self.shards)))
+        self.leases: Dict[int, Tuple[str, float]] = {}  # shard -> (worker, 到期时间)
+        self.done = set()
+        self.expired = set()  # 租约超时、尚未被重新借出的分片，接受任意 worker 的迟到结果
+        self.lock = threading.Lock()
+        self.results_queue: queue.Queue = queue.Queue()
+        self.events: queue.Queue = queue.Queue()  # 需要输出到日志的事件
+        self.stopped = False
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def finished(self) -> bool:
+        return len(self.done) == len(self.shards)
+
+    def job(self) -> Dict[str, Any]:
+        return {'dataset': self.dataset, 'sha256': self.sha256, 'size': self.size, 'dtype': self.dtype,
+                'strategy': self.space.config, 'evaluate_func': self.evaluate_func, 'period': self.period}
+
+    def requeue_expired(self):
+        """租约到期（worker 掉线或卡死）的分片放回队首，优先重新分配。"""
+        now = time.monotonic()
+        with self.lock:
+            for shard, (worker, deadline) in list(self.leases.items()):
+                if deadline < now:
+                    del self.leases[shard]
+                    self.pending.appendleft(shard)
+                    self.expired.add(shard)
+                    self.events.put(f'worker {worker} 的分片 {shard} 租约超时，重新排队')
+
+    def lease(self, worker: str) -> Dict[str, Any]:
+        self.requeue_expired()
+        with self.lock:
+            if self.stopped or self.finished:
+                return {'done': True}
+            if not self.pending:
+                # 剩余分片都已借出，worker 稍后再来（可能有分片因超时重新排队）
+                return {'wait': min(5.0, self.lease_timeout / 4)}
+            shard = self.pending.popleft()
+            self.expired.discard(shard)
+            self.leases[shard] = (worker, time.monotonic() + self.lease_timeout)
+        return {'shard': shard, 'params': self.shards[shard], 'lease_timeout': self.lease_timeout}
+
+    def heartbeat(self, worker: str, shard: int) -> bool:
+        with self.lock:
+            lease = self.leases.get(shard)
+            if lease is None or lease[0] != worker:
+                return False
+            self.leases[shard] = (worker, time.monotonic() + self.lease_timeout)
+            return True
+
+    def submit(self, worker: str, shard: int, results: List[Dict[str, Any]]) -> bool:
+        """
+        接收一个分片的结果（与分片内的参数组合一一对应）：只接受当前租约持有者，或租约已超时且尚未重新借出的分片。
+        分片已完成（超时后被别的 worker 先交）时忽略，避免重复计入。
+        """
+        with self.lock:
+            if shard in self.done or not 0 <= shard < len(self.shards) or len(results) != len(self.shards[shard]):
+                return False
+            lease = self.leases.get(shard)
+            if not ((lease is not None and lease[0] == worker) or (lease is None and shard in self.expired)):
+                return False
+            self.done.add(shard)
+            self.leases.pop(shard, None)
+            self.expired.discard(shard)
+            try:
+                self.pending.remove(shard)
+            except ValueError:
+                pass
+            # 在锁内入队：finished 为真时最后一个分片的结果一定已在队列中
+            self.results_queue.put((worker, shard, results))
+        return True
+
+    # --- HTTP 服务 ---
+
+    def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> Tuple[str, int]:
+        """在后台线程启动 HTTP 服务，返回实际监听的 (host, port)；port=0 时由系统分配。"""
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[:2]
+
+    def shutdown(self):
+        with self.lock:
+            self.stopped = True
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def _make_handler(coord: Coordinator):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # 请求日志太多，只通过 Coordinator.events 输出关键事件
+
+        def _send_json(self, obj: Dict[str, Any], status: int = 200):
+            body = json.dumps(obj).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            if coord.token is None or secrets.compare_digest(self.headers.get(TOKEN_HEADER, ''), coord.token):
+                return True
+            self._send_json({'error': 'forbidden'}, 403)
+            return False
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            if self.path == '/job':
+                self._send_json(coord.job())
+            elif self.path == f'/dataset/{coord.sha256}':
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv')
+                self.send_header('Content-Length', str(coord.size))
+                self.end_headers()
+                with open(coord.cleaned_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        self.wfile.write(chunk)
+            else:
+                self._send_json({'error': 'not found'}, 404)
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                data = json.loads(self.rfile.read(length) or b'{}')
+                worker = str(data.get('worker', self.client_address[0]))
+                if self.path == '/lease':
+                    reply = coord.lease(worker)
+                    if 'shard' in reply:
+                        coord.events.put(f'分片 {reply["shard"]} -> {worker}')
+                    self._send_json(reply)
+                elif self.path == '/heartbeat':
+                    self._send_json({'ok': coord.heartbeat(worker, int(data['shard']))})
+                elif self.path == '/result':
+                    self._send_json({'ok': coord.submit(worker, int(data['shard']), data['results'])})
+                else:
+                    self._send_json({'error': 'not found'}, 404)
+            except (ValueError, KeyError, TypeError) as e:
+                self._send_json({'error': str(e)}, 400)
+
+    return Handler
+
+
+def run_distributed_sweep(
+    strategy: Union[str, ParamSpace],
+    csv_name: str,
+    values: Dict[str, List[Any]],
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    shard_size: int = 20,
+    lease_timeout: float = 60.0,
+    local_workers: int = 0,
+    dtype: str = 'float64',
+    fast: bool = False,
+    period: Optional[Union[str, List[str]]] = None,
+    period_rank: str = 'Period Stability',
+    save_summary: bool = True,
+    stop_event: Optional[threading.Event] = None,
+    log_queue: Optional[queue.Queue] = None,
+    store_path: Optional[str] = DEFAULT_DB_PATH,
+    token: Optional[str] = None,
+) -> Optional[str]:
+    """
+    以协调器身份对 strategy（策略名或 ParamSpace）在 values 给出的参数取值上执行范围回测，
+    返回 grid_summary CSV 路径（中止或无结果时返回 None）。fast / period / period_rank 的含义与 run_sweep 相同。
+
+    远程 worker 通过 `python -m tool.distributedSweep worker --url http://<本机IP>:<port>` 加入；
+    local_workers > 0 时在本机额外启动相应数量的 worker 进程。
+    默认只监听本机；监听其他地址（如 0.0.0.0）且未给出 token 时自动生成令牌，worker 需用 --token 传入。
+    """
+    space = _resolve_space(strategy)
+    evaluate_name = _evaluate_func_name(space.config, fast)
+    if period:
+        period_codes(pd.DatetimeIndex(['2000-01-01']), period)  # 时段写法有误时在启动前报错
+    grid = space.build_grid({n: list(values[n]) for n in space.names})
+    total = len(grid)
+    cleaned_path = prepare_cleaned_csv(csv_name, stop_event, log_queue)
+    if cleaned_path is None or total == 0:
+        return None
+
+    if token is None and host not in ('127.0.0.1', 'localhost', '::1'):
+        token = secrets.token_urlsafe(16)
+    coord = Coordinator(cleaned_path, csv_name, space, grid, evaluate_name, shard_size, lease_timeout, dtype, period, token)
+    bound_host, bound_port = coord.serve(host, port)
+    _log(log_queue, f'协调器已启动: http://{socket.gethostname()}:{bound_port} '
+                    f'({space.name}, {total} 个组合, {len(coord.shards)} 个分片, 数据 sha256={coord.sha256[:12]})')
+    if token:
+        _log(log_queue, f'worker 需使用令牌加入: --token {token}')
+
+    procs = []
+    for i in range(local_workers):
+        url = f'http://127.0.0.1:{bound_port}'
+        p = multiprocessing.Process(target=run_worker, args=(url,), kwargs={'name': f'local-{i}', 'token': token}, daemon=True)
+        p.start()
+        procs.append(p)
+
+    store = ResultStore(store_path) if store_path else None
+    run_id = store.start_run(csv_name, space.name) if store else None
+    if store:
+        _log(log_queue, f'结果同时写入结果库: {store_path} (run_id={run_id})')
+
+    results = []
+    count = 0
+    start_time = datetime.datetime.now()
+    try:
+        while not coord.finished or not coord.results_queue.empty():
+            if stop_event and stop_event.is_set():
+                break
+            coord.requeue_expired()
+            while not coord.events.empty():
+                _log(log_queue, coord.events.get())
+            try:
+                worker, shard, shard_results = coord.results_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # 参数以协调器自己的分片为准，worker 只回传对应位置的统计结果
+            for params, row in zip(coord.shards[shard], shard_results):
+                if row['stats'] is not None:
+                    if store:
+                        store.add_result(run_id, params, row['stats'])
+                    results.append({**row['stats'], **params})
+            count += len(shard_results)
+            elapsed = datetime.datetime.now() - start_time
+            eta = datetime.timedelta(seconds=int((elapsed / count * (total - count)).total_seconds()))
+            _log(log_queue, f'[{count}/{total}] 分片 {shard} 完成 ({worker}) | 预计剩余: {eta}')
+    finally:
+        coord.shutdown()
+        if store:
+            store.close()
+        for p in procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+
+    if stop_event and stop_event.is_set():
+        _log(log_queue, '分布式回测被中止。')
+        return None
+    if not results or not save_summary:
+        _log(log_queue, '没有有效的回测结果。')
+        return None
+    output_path = save_grid_summary(results, space.names, log_queue)
+    if period:
+        save_period_summary(results, space.names, period_rank, log_queue)
+    return output_path
+
+
+# --- worker ---
+
+def _headers(token: Optional[str]) -> Dict[str, str]:
+    return {TOKEN_HEADER: token} if token else {}
+
+
+def _request(url: str, payload: Optional[Dict[str, Any]] = None, timeout: float = 30.0,
+             token: Optional[str] = None) -> Dict[str, Any]:
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json', **_headers(token)})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def fetch_dataset(url: str, job: Dict[str, Any], cache_dir: str = DEFAULT_CACHE_DIR,
+                  token: Optional[str] = None) -> str:
+    """
+    按 sha256 缓存数据集：本地已有且 sha256 一致时直接使用，否则从协调器下载到临时文件，
+    校验通过后再原子替换，不会用到截断或过期的文件。
+    """
+    sha = job['sha256']
+    path = os.path.join(cache_dir, f'{sha}.csv')
+    if os.path.isfile(path) and file_sha256(path) == sha:
+        return path
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    h = hashlib.sha256()
+    try:
+        req = urllib.request.Request(f'{url}/dataset/{sha}', headers=_headers(token))
+        with urllib.request.urlopen(req, timeout=60) as resp, open(tmp, 'wb') as f:
+            for chunk in iter(lambda: resp.read(1 << 20), b''):
+                h.update(chunk)
+                f.write(chunk)
+        if h.hexdigest() != sha:
+            raise ValueError(f'数据集校验失败: 期望 {sha}，实际 {h.hexdigest()}')
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def run_worker(url: str, cache_dir: str = DEFAULT_CACHE_DIR, name: Optional[str] = None,
+               stop_event: Optional[threading.Event] = None, log_queue: Optional[queue.Queue] = None,
+               max_retries: int = 5, token: Optional[str] = None) -> int:
+    """
+    连接协调器，循环领取分片并回测，直到协调器返回 done 或连续 max_retries 次连接失败。
+    返回本 worker 完成的分片数。
+    """
+    url = url.rstrip('/')
+    name = name or f'{socket.gethostname()}-{os.getpid()}'
+    failures = 0
+    errors = 0
+    shards_done = 0
+    job = None
+
+    while not (stop_event and stop_event.is_set()):
+        try:
+            if job is None:
+                reply = _request(f'{url}/job', token=token)
+                path = fetch_dataset(url, reply, cache_dir, token)
+                # 评估环境与本机多进程的 worker 相同：内存映射数据、策略的评估函数、指标缓存和时段划分
+                _init_worker(reply['strategy'], path, reply['dtype'], reply['evaluate_func'], reply['period'])
+                job = reply
+                _log(log_queue, f'[{name}] 已加载数据集 {job["dataset"]} ({job["sha256"][:12]})，'
+                                f'策略 {job["strategy"]["name"]}.{job["evaluate_func"]}')
+
+            reply = _request(f'{url}/lease', {'worker': name}, token=token)
+            failures = 0
+            if reply.get('done'):
+                break
+            if 'wait' in reply:
+                time.sleep(reply['wait'])
+                continue
+
+            shard = reply['shard']
+            beat_stop = threading.Event()
+            beat = threading.Thread(target=_heartbeat_loop, args=(url, name, shard, reply['lease_timeout'] / 3, beat_stop, token), daemon=True)
+            beat.start()
+            try:
+                results = [{'params': params, 'stats': _json_stats(stats) if stats is not None else None}
+                           for params, stats in _evaluate_chunk(reply['params'])]
+            finally:
+                beat_stop.set()
+            _request(f'{url}/result', {'worker': name, 'shard': shard, 'results': results}, token=token)
+            shards_done += 1
+            errors = 0
+        except (urllib.error.URLError, ConnectionError, socket.timeout) as e:
+            failures += 1
+            if failures >= max_retries:
+                _log(log_queue, f'[{name}] 无法连接协调器，退出: {e}')
+                break
+            time.sleep(min(2 ** failures, 30))
+        except Exception as e:
+            # 其他错误（数据加载、结果序列化等）不退出：心跳已停，租约超时后分片会重新分配
+            errors += 1
+            _log(log_queue, f'[{name}] 出错，稍后继续领取分片: {type(e).__name__}: {e}')
+            time.sleep(min(2 ** errors, 30))
+
+    _log(log_queue, f'[{name}] 结束，共完成 {shards_done} 个分片')
+    return shards_done
+
+
+def _heartbeat_loop(url: str, name: str, shard: int, interval: float, stop: threading.Event,
+                    token: Optional[str] = None):
+    while not stop.wait(interval):
+        try:
+            _request(f'{url}/heartbeat', {'worker': name, 'shard': shard}, timeout=10, token=token)
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            pass  # 协调器暂时不可达时继续计算，租约可能因此超时被重新分配
+
+
+# --- 命令行 ---
+
+def main():
+    parser = argparse.ArgumentParser(description='按 config.json 中声明的参数空间执行分布式范围回测')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    c = sub.add_parser('coordinator', help='启动协调器并分发参数网格')
+    c.add_argument('strategy', help='策略名，例如 EMA_2ATR')
+    c.add_argument('csv', help='data/no 下的数据文件名（不含扩展名）')
+    c.add_argument('--set', action='append', default=[], metavar='NAME=RANGE',
+                   help='参数范围，例如 ema_period=10-50 或 atr1=1,1.5,2；未给出的参数使用配置中的默认范围')
+    c.add_argument('--host', default=DEFAULT_HOST, help='监听地址，供其他机器连接时使用 0.0.0.0')
+    c.add_argument('--token', help='共享令牌；监听非本机地址且未指定时自动生成')
+    c.add_argument('--port', type=int, default=DEFAULT_PORT)
+    c.add_argument('--shard-size', type=int, default=20)
+    c.add_argument('--lease-timeout', type=float, default=60.0)
+    c.add_argument('--local-workers', type=int, default=0, help='同时在本机启动的 worker 数')
+    c.add_argument('--dtype', default='float64', choices=['float64', 'float32'])
+    c.add_argument('--fast', action='store_true', help='使用策略配置的 fast_evaluate_func（快速撮合内核）')
+    c.add_argument('--period', help="分时段稳定性统计: M / Q / Y / W / D、等长窗口如 10D，或逗号分隔的分界日期")
+    c.add_argument('--period-rank', default='Period Stability', help='分时段收益表的排序指标')
+    c.add_argument('--db', default=DEFAULT_DB_PATH)
+
+    w = sub.add_parser('worker', help='连接协调器领取分片')
+    w.add_argument('--url', required=True, help='协调器地址，例如 http://192.168.1.10:8765')
+    w.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    w.add_argument('--name')
+    w.add_argument('--token', help='协调器日志中给出的共享令牌')
+
+    args = parser.parse_args()
+    if args.command == 'coordinator':
+        space = ParamSpace.from_config(args.strategy)
+        texts = {p['name']: p['range'] for p in space.params}
+        for item in args.set:
+            name, text = item.split('=', 1)
+            texts[name.strip()] = text
+        values = {n: space.parse_values(n, texts[n]) for n in space.names}
+        period = args.period.split(',') if args.period and ',' in args.period else args.period
+        run_distributed_sweep(
+            space, args.csv, values, host=args.host, port=args.port, shard_size=args.shard_size,
+            lease_timeout=args.lease_timeout, local_workers=args.local_workers, dtype=args.dtype,
+            fast=args.fast, period=period, period_rank=args.period_rank, store_path=args.db, token=args.token,
+        )
+    else:
+        run_worker(args.url, args.cache_dir, args.name, token=args.token)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+fillKernel.py
+
+单品种成交 / 出场模拟内核：给定逐根 K 线的开仓信号及止损止盈价，算出每笔交易的进出场和权益曲线，
+结果与 backtesting.py 中策略每根 K 线调用 self.buy(sl=..., tp=...) / self.sell(...)（默认满仓比例）逐笔一致:
+
+ - 第 i 根 K 线收盘产生的信号，在第 i+1 根开盘价成交（市价单）
+ - 订单队列顺序与 backtesting.py 相同：先各持仓的止损（新开的在前），再止盈（先开的在前），最后市价单；
+   同一根同时触及止损止盈按止损。跳空时按开盘价成交（多头止损 min(开盘, 止损)，止盈 max(开盘, 止盈)，空头相反）
+ - 市价单的手数 = int(可用保证金 * (1 - eps) // 开盘价)，可用保证金按本根收盘价计算（与 backtesting.py 相同）。
+   满仓时仍可能剩下几手的余量，此时新信号会追加小额仓位；反向信号先按先进先出平掉 / 减少反向持仓，
+   剩余手数再开新仓，保证金不足则撤单
+ - 新开的仓位在开仓当根即可触发止损 / 止盈
+ - 回测结束时仍未平仓的交易不计入交易记录，但计入权益
+ - 不计手续费和点差；资金耗尽（权益 <= 0）时 backtesting.py 会强制平仓并停止，这里不模拟
+
+两种实现，共用同一个逐根处理函数 _process_bar，结果完全相同:
+ - numba: 逐根 K 线的编译循环，每核每秒可处理数百万根 K 线（需要安装可选依赖 numba）
+ - numpy: 未安装 numba 时的后备实现，按事件跳跃 —— 只在有订单成交或持仓触及止损 / 止盈的 K 线上调用
+   _process_bar，每笔持仓用向量化搜索找到下一次触及的位置，Python 循环次数与交易笔数同量级而不是 K 线数
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # numba 是可选依赖
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+ENGINES = ('auto', 'numba', 'numpy', 'python')
+
+# backtesting.py 默认下单比例 (1 - 机器精度)
+SIZE_FRACTION = 1 - np.finfo(float).eps
+
+TRADE_FIELDS = ('entry_bar', 'exit_bar', 'entry_price', 'exit_price', 'size', 'pnl', 'return_pct')
+
+# 持仓表 book 的列：手数（空头为负）、开仓价、开仓 K 线、止损、止盈、下一次触及止损/止盈的 K 线（numpy 后备使用）
+_SIZE, _ENTRY_PX, _ENTRY_BAR, _SL, _TP, _NEXT_HIT = range(6)
+# 交易记录 rec 的列：开仓 K 线、出场 K 线、开仓价、出场价、手数
+_REC_COLS = 5
+
+
+# --- 逐根 K 线处理（numba 编译；未安装时为普通 Python 函数） ---
+
+@njit(cache=True)
+def _close_trade(book, m, j, size, px, t, rec, k, cash):
+    """按 px 平掉第 j 笔持仓中的 size 手（与持仓同向），写入交易记录；全部平掉时从持仓表移除。"""
+    rec[k, 0] = book[j, _ENTRY_BAR]
+    rec[k, 1] = t
+    rec[k, 2] = book[j, _ENTRY_PX]
+    rec[k, 3] = px
+    rec[k, 4] = size
+    cash += size * (px - book[j, _ENTRY_PX])
+    left = book[j, _SIZE] - size
+    if left == 0.0:
+        for r in range(j, m - 1):
+            book[r, :] = book[r + 1, :]
+        m -= 1
+    else:
+        book[j, _SIZE] = left
+    return m, k + 1, cash
+
+
+@njit(cache=True)
+def _margin_available(book, m, cash, c):
+    """backtesting.py 的 margin_available：权益减去持仓按收盘价计的市值，不小于 0。"""
+    equity = cash
+    used = 0.0
+    for j in range(m):
+        equity += book[j, _SIZE] * (c - book[j, _ENTRY_PX])
+        used += abs(book[j, _SIZE]) * c
+    return max(0.0, equity - used)
+
+
+@njit(cache=True)
+def _check_exits(book, m, lo, o, h, l, t, rec, k, cash):
+    """处理第 lo 笔之后各持仓的止损（新开的在前）和止盈（先开的在前）。"""
+    j = m - 1
+    while j >= lo:
+        s = book[j, _SIZE]
+        p_sl = book[j, _SL]
+        if s > 0 and l <= p_sl:
+            m, k, cash = _close_trade(book, m, j, s, min(o, p_sl), t, rec, k, cash)
+        elif s < 0 and h >= p_sl:
+            m, k, cash = _close_trade(book, m, j, s, max(o, p_sl), t, rec, k, cash)
+        j -= 1
+    j = lo
+    while j < m:
+        s = book[j, _SIZE]
+        p_tp = book[j, _TP]
+        if s > 0 and h >= p_tp:
+            m, k, cash = _close_trade(book, m, j, s, max(o, p_tp), t, rec, k, cash)
+        elif s < 0 and l <= p_tp:
+            m, k, cash = _close_trade(book, m, j, s, min(o, p_tp), t, rec, k, cash)
+        else:
+            j += 1
+    return m, k, cash
+
+
+@njit(cache=True)
+def _position(book, m):
+    """持仓总手数和 Σ 手数 * 开仓价；权益 = 现金 + (收盘价 * 总手数 - Σ 手数 * 开仓价)，与 backtesting.py 算法相同。"""
+    units = 0.0
+    cost = 0.0
+    for j in range(m):
+        units += book[j, _SIZE]
+        cost += book[j, _SIZE] * book[j, _ENTRY_PX]
+    return units, cost
+
+
+@njit(cache=True)
+def _process_bar(t, o, h, l, c, pend, pend_sl, pend_tp, book, m, rec, k, cash, size_fraction):
+    """
+    处理第 t 根 K 线：已有持仓的止损 / 止盈，然后上一根的信号 pend（1 / -1 / 0）按开盘价成交。
+    返回更新后的 (持仓数 m, 记录数 k, 现金 cash)。
+    """
+    if m > 0:
+        m, k, cash = _check_exits(book, m, 0, o, h, l, t, rec, k, cash)
+    if pend == 0.0:
+        return m, k, cash
+
+    units = (_margin_available(book, m, cash, c) * size_fraction) // o
+    if units == 0.0:
+        return m, k, cash  # 保证金连 1 手都不够，撤单
+    need = pend * units
+    # 先进先出平掉 / 减少反向持仓
+    j = 0
+    while j < m and need != 0.0:
+        s = book[j, _SIZE]
+        if s * need > 0:
+            j += 1
+        elif abs(need) >= abs(s):
+            need += s
+            m, k, cash = _close_trade(book, m, j, s, o, t, rec, k, cash)
+        else:
+            m, k, cash = _close_trade(book, m, j, -need, o, t, rec, k, cash)
+            need = 0.0
+    if need == 0.0 or abs(need) * o > _margin_available(book, m, cash, c):
+        return m, k, cash  # 反向持仓已抵消，或剩余保证金不足撤单
+
+    book[m, _SIZE] = need
+    book[m, _ENTRY_PX] = o
+    book[m, _ENTRY_BAR] = t
+    book[m, _SL] = pend_sl
+    book[m, _TP] = pend_tp
+    book[m, _NEXT_HIT] = -1
+    m += 1
+    # 新仓位的止损 / 止盈在开仓当根再检查一次
+    return _check_exits(book, m, m - 1, o, h, l, t, rec, k, cash)
+
+
+@njit(cache=True)
+def _fill_loop(open_, high, low, close, direction, sl, tp, cash, size_fraction):
+    n = close.shape[0]
+    n_orders = 0
+    for t in range(n):
+        if direction[t] != 0:
+            n_orders += 1
+    # 每个订单最多开一笔仓、部分平掉一笔仓，记录数不超过订单数的两倍
+    book = np.empty((n_orders + 1, 6))
+    rec = np.empty((2 * n_orders + 1, _REC_COLS))
+    equity = np.empty(n)
+    m = 0
+    k = 0
+    for t in range(n):
+        pend = direction[t - 1] if t > 0 else 0.0
+        if pend != 0.0 or m > 0:
+            m, k, cash = _process_bar(t, open_[t], high[t], low[t], close[t], pend, sl[t - 1], tp[t - 1],
+                                      book, m, rec, k, cash, size_fraction)
+        units, cost = _position(book, m)
+        equity[t] = cash + (close[t] * units - cost)
+    return rec[:k], equity
+
+
+# --- numpy 后备实现：按事件跳跃 ---
+
+def _next_hit(s: float, p_sl: float, p_tp: float, high, low, start: int) -> int:
+    """从 start 开始找第一根触及止损 / 止盈的 K 线，窗口逐步放大，避免每笔持仓都扫描到数据末尾。"""
+    n = len(high)
+    pos, window = start, 64
+    while pos < n:
+        end = min(n, pos + window)
+        if s > 0:
+            hit = (low[pos:end] <= p_sl) | (high[pos:end] >= p_tp)
+        else:
+            hit = (high[pos:end] >= p_sl) | (low[pos:end] <= p_tp)
+        if hit.any():
+            return pos + int(hit.argmax())
+        pos, window = end, window * 4
+    return n
+
+
+def _fill_events(open_, high, low, close, direction, sl, tp, cash, size_fraction):
+    n = len(close)
+    signals = np.flatnonzero(direction[:-1] != 0)  # 最后一根的信号没有下一根可成交
+    book = np.empty((len(signals) + 1, 6))
+    rec = np.empty((2 * len(signals) + 1, _REC_COLS))
+    m = k = 0
+    # 两次事件之间持仓不变，权益 = 现金 + (收盘价 * 总手数 - 成本)；记录每段的起点和这三个量
+    seg_start, seg_cash, seg_units, seg_cost = [0], [cash], [0.0], [0.0]
+    si = 0
+    t = signals[0] + 1 if len(signals) else n
+    while t < n:
+        if si < len(signals) and signals[si] == t - 1:
+            pend, pend_sl, pend_tp = direction[t - 1], sl[t - 1], tp[t - 1]
+            si += 1
+        else:
+            pend = pend_sl = pend_tp = 0.0
+        m, k, cash = _process_bar(t, open_[t], high[t], low[t], close[t], pend, pend_sl, pend_tp,
+                                  book, m, rec, k, cash, size_fraction)
+        for j in range(m):
+            if book[j, _NEXT_HIT] < 0:
+                book[j, _NEXT_HIT] = _next_hit(book[j, _SIZE], book[j, _SL], book[j, _TP], high, low, t + 1)
+        units, cost = _position(book, m)
+        seg_start.append(t)
+        seg_cash.append(cash)
+        seg_units.append(units)
+        seg_cost.append(cost)
+        t_next = signals[si] + 1 if si < len(signals) else n
+        if m:
+            t_next = min(t_next, int(book[:m, _NEXT_HIT].min()))
+        t = t_next
+
+    lengths = np.diff(np.append(seg_start, n))
+    equity = np.repeat(seg_cash, lengths) + (close * np.repeat(seg_units, lengths) - np.repeat(seg_cost, lengths))
+    return rec[:k], equity
+
+
+def simulate_fills(
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    direction: np.ndarray,
+    sl: np.ndarray,
+    tp: np.ndarray,
+    cash: float,
+    engine: str = 'auto',
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    模拟单品种的成交与出场。
+
+    direction: 每根 K 线收盘的信号，1 做多、-1 做空、0 无信号
+    sl / tp: 信号对应的止损、止盈价（无信号处不使用，NaN 表示不设）
+    engine: 'auto'（有 numba 用 numba，否则 numpy）、'numba'、'numpy'，或 'python'（纯 Python 逐根循环，仅用于核对）
+
+    返回 (trades, equity)。trades 为各列数组的字典，字段见 TRADE_FIELDS，按平仓顺序排列，size 空头为负；
+    equity 为每根 K 线收盘时的权益。
+    """
+    if engine not in ENGINES:
+        raise ValueError(f'不支持的引擎: {engine}，可选 {ENGINES}')
+    if engine == 'numba' and not HAS_NUMBA:
+        raise ImportError('未安装 numba，请 pip install numba 或使用 engine="numpy"')
+    arrays = [np.ascontiguousarray(a, dtype=np.float64) for a in (open_, high, low, close, direction, sl, tp)]
+
+    if engine == 'numpy' or (engine == 'auto' and not HAS_NUMBA):
+        rec, equity = _fill_events(*arrays, float(cash), SIZE_FRACTION)
+    elif engine == 'python' and HAS_NUMBA:
+        rec, equity = _fill_loop.py_func(*arrays, float(cash), SIZE_FRACTION)
+    else:
+        rec, equity = _fill_loop(*arrays, float(cash), SIZE_FRACTION)
+
+    entry_px, exit_px, units = rec[:, 2], rec[:, 3], rec[:, 4]
+    trades = {
+        'entry_bar': rec[:, 0].astype(np.int64), 'exit_bar': rec[:, 1].astype(np.int64),
+        'entry_price': entry_px, 'exit_price': exit_px, 'size': units,
+        'pnl': units * (exit_px - entry_px), 'return_pct': np.sign(units) * (exit_px / entry_px - 1),
+    }
+    return trades, equity
@@ -0,0 +1,277 @@
+"""
+gridView.py
+
+范围回测结果的热力图渲染：直接读取结果库 (resultStore) 或 grid_summary CSV，
+在任意两个参数轴上绘制指标热力图 / 切片，无需重新运行回测。
+
+主要功能：
+ - GridAccumulator: 增量累加结果到二维网格（其余参数按 max/min/mean 聚合，或固定取值做切片），
+   新结果只更新对应的格子，适合回测进行中实时刷新
+ - downsample: 网格超过显示上限时按块聚合，10 万格也能在 1 秒内绘出
+ - render_png / render_html: 导出 PNG 或内嵌图片的 HTML 报告
+
+命令行示例：
+    python -m tool.gridView --x ema_period --y atr1 --metric "Return [%]" --out result/many/heatmap.html
+    python -m tool.gridView --csv result/many/grid_summary_20250901_120000.csv --x ema_period --y atr2 --fix atr1=2.0 --out heatmap.png
+"""
+
+import argparse
+import base64
+import io
+import os
+import warnings
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tool.resultStore import ResultStore, DEFAULT_DB_PATH
+
+# 屏幕上单个方向最多显示的格子数，超过后按块聚合
+MAX_DISPLAY_CELLS = 400
+
+AGGREGATIONS = ('max', 'min', 'mean')
+
+
+class GridAccumulator:
+    """
+    把 (x, y, 指标) 结果增量累加为二维网格。
+
+    - 轴取值按数值排序；出现新的轴取值时整体重排一次（向量化，开销很小），否则只更新新增行对应的格子。
+    - fixed: {参数: 取值}，只保留其余参数等于这些取值的行（切片）；未固定的参数按 agg 聚合。
+    """
+
+    def __init__(self, x: str, y: str, metric: str, agg: str = 'max', fixed: Optional[Dict[str, Any]] = None):
+        if agg not in AGGREGATIONS:
+            raise ValueError(f'不支持的聚合方式: {agg}')
+        self.x, self.y, self.metric, self.agg = x, y, metric, agg
+        self.fixed = fixed or {}
+        self.x_values = np.array([])
+        self.y_values = np.array([])
+        self._xs = np.array([])
+        self._ys = np.array([])
+        self._vs = np.array([])
+        self._reset_grid()
+
+    def _reset_grid(self):
+        shape = (len(self.y_values), len(self.x_values))
+        fill = {'max': -np.inf, 'min': np.inf, 'mean': 0.0}[self.agg]
+        self._acc = np.full(shape, fill)
+        self._count = np.zeros(shape, dtype=np.int64)
+
+    def _scatter(self, xs: np.ndarray, ys: np.ndarray, vs: np.ndarray):
+        """把一批点累加到网格上（np.ufunc.at 无需 Python 循环）。"""
+        xi = np.searchsorted(self.x_values, xs)
+        yi = np.searchsorted(self.y_values, ys)
+        if self.agg == 'max':
+            np.maximum.at(self._acc, (yi, xi), vs)
+        elif self.agg == 'min':
+            np.minimum.at(self._acc, (yi, xi), vs)
+        else:
+            np.add.at(self._acc, (yi, xi), vs)
+        np.add.at(self._count, (yi, xi), 1)
+
+    def update(self, df: pd.DataFrame) -> bool:
+        """
+        累加新的结果行（需包含 x、y、metric 及 fixed 中的列）。返回网格形状是否发生变化。
+        """
+        if df.empty or self.metric not in df.columns:
+            return False
+        mask = df[self.metric].notna()
+        for name, value in self.fixed.items():
+            if name in df.columns:
+                mask &= np.isclose(df[name].astype(float), float(value))
+        df = df[mask]
+        if df.empty:
+            return False
+
+        xs = df[self.x].to_numpy(dtype=float)
+        ys = df[self.y].to_numpy(dtype=float)
+        vs = df[self.metric].to_numpy(dtype=float)
+        self._xs = np.concatenate([self._xs, xs])
+        self._ys = np.concatenate([self._ys, ys])
+        self._vs = np.concatenate([self._vs, vs])
+
+        new_x = np.setdiff1d(xs, self.x_values)
+        new_y = np.setdiff1d(ys, self.y_values)
+        if new_x.size or new_y.size:
+            # 出现新的轴取值：重建网格
+            self.x_values = np.union1d(self.x_values, new_x)
+            self.y_values = np.union1d(self.y_values, new_y)
+            self._reset_grid()
+            self._scatter(self._xs, self._ys, self._vs)
+            return True
+        self._scatter(xs, ys, vs)
+        return False
+
+    def grid(self) -> np.ndarray:
+        """当前网格 (len(y_values) × len(x_values))，没有结果的格子为 NaN。"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = self._acc / self._count if self.agg == 'mean' else self._acc.copy()
+        out[self._count == 0] = np.nan
+        return out
+
+    @property
+    def n_points(self) -> int:
+        return int(self._vs.size)
+
+
+def downsample(grid: np.ndarray, x_values: np.ndarray, y_values: np.ndarray,
+               max_cells: int = MAX_DISPLAY_CELLS, agg: str = 'max') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    网格任一方向超过 max_cells 时按整数块聚合（块内取 max/min/mean，忽略 NaN），
+    返回 (新网格, 新 x 轴取值, 新 y 轴取值)，轴取值为每块的第一个值。
+    """
+    fy = max(1, int(np.ceil(grid.shape[0] / max_cells)))
+    fx = max(1, int(np.ceil(grid.shape[1] / max_cells)))
+    if fy == 1 and fx == 1:
+        return grid, x_values, y_values
+
+    ny, nx = -(-grid.shape[0] // fy), -(-grid.shape[1] // fx)
+    padded = np.full((ny * fy, nx * fx), np.nan)
+    padded[:grid.shape[0], :grid.shape[1]] = grid
+    blocks = padded.reshape(ny, fy, nx, fx)
+    reducer = {'max': np.nanmax, 'min': np.nanmin, 'mean': np.nanmean}[agg]
+    with warnings.catch_warnings():
+        # 全为 NaN 的块会触发 "All-NaN slice" 警告，结果本来就应是 NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        small = reducer(blocks, axis=(1, 3))
+    return small, x_values[::fx], y_values[::fy]
+
+
+def _tick_positions(values: np.ndarray, max_ticks: int = 12) -> np.ndarray:
+    step = max(1, int(np.ceil(len(values) / max_ticks)))
+    return np.arange(0, len(values), step)
+
+
+def draw_heatmap(ax, acc: GridAccumulator, max_cells: int = MAX_DISPLAY_CELLS, cmap: str = 'RdYlGn'):
+    """
+    在 matplotlib Axes 上绘制热力图，返回 AxesImage。
+    之后可通过 refresh_heatmap 只更新图像数据，而不必重建整张图。
+    """
+    grid, xv, yv = downsample(acc.grid(), acc.x_values, acc.y_values, max_cells, acc.agg)
+    image = ax.imshow(grid, origin='lower', aspect='auto', cmap=cmap, interpolation='nearest')
+    _apply_axes(ax, acc, xv, yv)
+    return image
+
+
+def refresh_heatmap(image, acc: GridAccumulator, reshaped: bool, max_cells: int = MAX_DISPLAY_CELLS):
+    """用累加器的最新网格刷新已有的 AxesImage。reshaped 为 True 时同时更新坐标轴。"""
+    grid, xv, yv = downsample(acc.grid(), acc.x_values, acc.y_values, max_cells, acc.agg)
+    image.set_data(grid)
+    if reshaped:
+        image.set_extent((-0.5, grid.shape[1] - 0.5, -0.5, grid.shape[0] - 0.5))
+        _apply_axes(image.axes, acc, xv, yv)
+    finite = grid[np.isfinite(grid)]
+    if finite.size:
+        image.set_clim(finite.min(), finite.max())
+
+
+def _apply_axes(ax, acc: GridAccumulator, xv: np.ndarray, yv: np.ndarray):
+    xt, yt = _tick_positions(xv), _tick_positions(yv)
+    ax.set_xticks(xt)
+    ax.set_xticklabels([f'{v:g}' for v in xv[xt]])
+    ax.set_yticks(yt)
+    ax.set_yticklabels([f'{v:g}' for v in yv[yt]])
+    ax.set_xlabel(acc.x)
+    ax.set_ylabel(acc.y)
+    fixed = ', '.join(f'{k}={v}' for k, v in acc.fixed.items())
+    ax.set_title(f"{acc.metric} ({fixed if fixed else acc.agg})")
+
+
+def load_results(run_id: Optional[str] = None, csv_path: Optional[str] = None,
+                 store_path: str = DEFAULT_DB_PATH) -> pd.DataFrame:
+    """从结果库（默认最近一次批量回测）或 grid_summary CSV 读取结果。"""
+    if csv_path:
+        return pd.read_csv(csv_path)
+    with ResultStore(store_path) as store:
+        if run_id is None:
+            latest = store.latest_run()
+            if latest is None:
+                raise ValueError(f'结果库中没有任何记录: {store_path}')
+            run_id = latest[0]
+        return store.load_run(run_id)
+
+
+def _render_figure(acc: GridAccumulator, max_cells: int = MAX_DISPLAY_CELLS):
+    # 导出时使用无界面的 Agg 后端，不依赖 Tk
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(9, 6), dpi=110)
+    ax = fig.add_subplot(111)
+    image = draw_heatmap(ax, acc, max_cells)
+    fig.colorbar(image, ax=ax, label=acc.metric)
+    fig.tight_layout()
+    return fig
+
+
+def render_png(acc: GridAccumulator, out_path: str, max_cells: int = MAX_DISPLAY_CELLS) -> str:
+    """把热力图保存为 PNG，返回路径。"""
+    if os.path.dirname(out_path):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    _render_figure(acc, max_cells).savefig(out_path)
+    return out_path
+
+
+def render_html(acc: GridAccumulator, df: pd.DataFrame, out_path: str, top: int = 20,
+                max_cells: int = MAX_DISPLAY_CELLS) -> str:
+    """导出 HTML 报告：内嵌热力图（base64 PNG）以及指标最优的前 top 个组合。"""
+    buf = io.BytesIO()
+    _render_figure(acc, max_cells).savefig(buf, format='png')
+    img = base64.b64encode(buf.getvalue()).decode('ascii')
+
+    table = df.dropna(subset=[acc.metric]).nlargest(top, acc.metric)
+    table = table.drop(columns=[c for c in ('id',) if c in table.columns])
+    html = f"""<!DOCTYPE html>
+<html lang="zh">
+<head><meta charset="utf-8"><title>{acc.metric} 热力图</title>
+<style>body{{font-family:sans-serif;margin:24px}} table{{border-collapse:collapse}} td,th{{border:1px solid #ccc;padding:4px 8px;text-align:right}}</style>
+</head>
+<body>
+<h2>{acc.metric}: {acc.y} × {acc.x}</h2>
+<p>共 {acc.n_points} 个组合，网格 {len(acc.y_values)} × {len(acc.x_values)}</p>
+<img src="data:image/png;base64,{img}">
+<h3>前 {top} 名</h3>
+{table.to_html(index=False, float_format=lambda v: f'{v:.4g}')}
+</body>
+</html>
+"""
+    if os.path.dirname(out_path):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    return out_path
+
+
+def _parse_fixed(items: List[str]) -> Dict[str, float]:
+    fixed = {}
+    for item in items or []:
+        name, _, value = item.partition('=')
+        fixed[name.strip()] = float(value)
+    return fixed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把范围回测结果渲染为热力图 (PNG/HTML)')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='结果库路径')
+    parser.add_argument('--run-id', help='结果库中的 run_id，默认最近一次')
+    parser.add_argument('--csv', help='直接读取 grid_summary CSV')
+    parser.add_argument('--x', default='ema_period')
+    parser.add_argument('--y', default='atr1')
+    parser.add_argument('--metric', default='Return [%]')
+    parser.add_argument('--agg', default='max', choices=AGGREGATIONS, help='未固定参数的聚合方式')
+    parser.add_argument('--fix', nargs='*', help='固定其他参数做切片，例如 atr2=3.0')
+    parser.add_argument('--out', default=os.path.join('result', 'many', 'heatmap.html'), help='.png 或 .html')
+    args = parser.parse_args()
+
+    df = load_results(args.run_id, args.csv, args.db)
+    acc = GridAccumulator(args.x, args.y, args.metric, args.agg, _parse_fixed(args.fix))
+    acc.update(df)
+    if args.out.lower().endswith('.png'):
+        path = render_png(acc, args.out)
+    else:
+        path = render_html(acc, df, args.out)
+    print(f'已导出: {os.path.abspath(path)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+paramSpace.py
+
+策略参数空间的声明式描述，来自 config.json 中策略条目的 "params" 和 "indicators" 字段：
+
+    "params": [
+        {"name": "ema_period", "label": "EMA 周期", "type": "int", "default": 9, "range": "1-50", "min": 1},
+        {"name": "atr1", "label": "ATR1 倍数", "type": "float", "default": 3.0, "range": "1.0,2.0,3.0"}
+    ],
+    "indicators": {
+        "ema": {"func": "ema_indicator", "inputs": ["Close"], "params": {"period": "ema_period"}}
+    }
+
+ - params: 参数名、类型 (int / float)、单次回测默认值、范围回测默认范围，可选 min / max 校验
+ - indicators: 指标函数（位于策略的 logic_module）、输入列、以及指标参数与策略参数的对应关系。
+   由此可知每个指标依赖哪些参数，通用执行器 (tool.sweepRunner) 据此缓存指标、安排网格顺序
+
+范围文本的格式（与原 UI 一致并略作扩展）:
+    '1-50'         闭区间，步长 1
+    '0.5-3:0.5'    闭区间，指定步长
+    '1,2,3'        列表
+"""
+
+import os
+import re
+import json
+import hashlib
+import itertools
+from typing import Dict, Any, List, Tuple
+
+PARAM_TYPES = {'int': int, 'float': float}
+
+# 项目根目录下的 config.json，与当前工作目录无关
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.json')
+
+_RANGE_RE = re.compile(r'^\s*(-?[\d.]+)\s*-\s*(-?[\d.]+)\s*(?::\s*([\d.]+))?\s*$')
+
+
+def load_strategy_config(name: str, path: str = DEFAULT_CONFIG_PATH) -> Dict[str, Any]:
+    """从 config.json 读取指定策略的配置条目。"""
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    for strategy_config in config.get('strategies', []):
+        if strategy_config['name'] == name:
+            return strategy_config
+    raise KeyError(f'config.json 中没有策略: {name}')
+
+
+class ParamSpace:
+    """一个策略的参数声明及指标依赖关系。"""
+
+    def __init__(self, strategy_config: Dict[str, Any]):
+        self.config = strategy_config
+        self.name = strategy_config['name']
+        self.logic_module = strategy_config['logic_module']
+        self.params: List[Dict[str, Any]] = strategy_config['params']
+        self.indicators: Dict[str, Dict[str, Any]] = strategy_config.get('indicators', {})
+        self._by_name = {p['name']: p for p in self.params}
+        for ind_name, ind in self.indicators.items():
+            unknown = set(ind.get('params', {}).values()) - set(self._by_name)
+            if unknown:
+                raise ValueError(f'指标 {ind_name} 依赖未声明的参数: {sorted(unknown)}')
+
+    @classmethod
+    def from_config(cls, name: str, path: str = DEFAULT_CONFIG_PATH) -> 'ParamSpace':
+        return cls(load_strategy_config(name, path))
+
+    @property
+    def names(self) -> List[str]:
+        return [p['name'] for p in self.params]
+
+    def defaults(self) -> Dict[str, Any]:
+        return {p['name']: self.cast(p['name'], p['default']) for p in self.params}
+
+    # --- 解析与校验 ---
+
+    def cast(self, name: str, value) -> Any:
+        spec = self._by_name[name]
+        typ = PARAM_TYPES[spec.get('type', 'float')]
+        value = float(value)
+        if typ is int:
+            if not value.is_integer():
+                raise ValueError(f'{name} 必须是整数')
+            value = int(value)
+        if 'min' in spec and value < spec['min']:
+            raise ValueError(f'{name} 不能小于 {spec["min"]}')
+        if 'max' in spec and value > spec['max']:
+            raise ValueError(f'{name} 不能大于 {spec["max"]}')
+        return value
+
+    def parse_values(self, name: str, text: str) -> List[Any]:
+        """把范围文本解析为参数值列表，格式见模块说明。"""
+        m = _RANGE_RE.match(text)
+        if m:
+            start, stop = float(m.group(1)), float(m.group(2))
+            step = float(m.group(3)) if m.group(3) else 1.0
+            if step <= 0 or stop < start:
+                raise ValueError(f'{name} 的范围不正确: {text}')
+            n = int(round((stop - start) / step)) + 1
+            values = [round(start + i * step, 10) for i in range(n)]
+        else:
+            values = [v.strip() for v in text.split(',') if v.strip()]
+        if not values:
+            raise ValueError(f'{name} 没有取值')
+        return [self.cast(name, v) for v in values]
+
+    # --- 网格与指标依赖 ---
+
+    def indicator_deps(self) -> Dict[str, List[str]]:
+        """每个指标依赖的策略参数名。"""
+        return {ind_name: sorted(set(ind.get('params', {}).values())) for ind_name, ind in self.indicators.items()}
+
+    def dependency_params(self) -> List[str]:
+        """影响任一指标的参数，按声明顺序。"""
+        deps = {n for names in self.indicator_deps().values() for n in names}
+        return [n for n in self.names if n in deps]
+
+    def indicator_key(self, ind_name: str, params: Dict[str, Any]) -> Tuple:
+        """指标缓存键：指标名 + 其依赖参数的取值。"""
+        ind_params = self.indicators[ind_name].get('params', {})
+        return (ind_name,) + tuple((arg, params[p]) for arg, p in sorted(ind_params.items()))
+
+    def group_key(self, params: Dict[str, Any]) -> Tuple:
+        """所有指标依赖参数的取值；同组的组合共享全部指标。"""
+        return tuple(params[n] for n in self.dependency_params())
+
+    def build_grid(self, values: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+        """
+        生成参数网格。影响指标的参数放在最外层循环，相邻组合尽量共享指标，
+        顺序执行时指标缓存只需保留最近的少量条目。
+        """
+        missing = set(self.names) - set(values)
+        if missing:
+            raise ValueError(f'缺少参数取值: {sorted(missing)}')
+        order = self.dependency_params() + [n for n in self.names if n not in self.dependency_params()]
+        grid = []
+        for combo in itertools.product(*(values[n] for n in order)):
+            params = dict(zip(order, combo))
+            grid.append({n: params[n] for n in self.names})
+        return grid
+
+    def fingerprint(self, dataset: str, values: Dict[str, List[Any]], **extra) -> str:
+        """同一策略、数据集和参数取值的唯一标识，用作断点续跑文件名。"""
+        payload = json.dumps({'strategy': self.name, 'dataset': dataset,
+                              'values': {n: list(values[n]) for n in self.names}, **extra},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
@@ -0,0 +1,166 @@
+"""
+periodStats.py
+
+从一次完整回测的权益曲线和交易记录计算分时段统计（按月、按季或自定义窗口），
+不必把数据拆成多个文件分别回测 —— 那样每段开头指标都要重新预热，而且重复计算。
+
+时段的写法 (freq):
+    'M' / 'Q' / 'Y' / 'W' / 'D'   自然月、季、年、周、日
+    '10D' / '12h' 等              从数据第一根 K 线起的等长窗口
+    ['2024-01-01', '2024-07-01', '2025-01-01']   自定义分界点，相邻两点为一个时段，范围外的 K 线不统计
+
+每个时段的统计:
+ - Return [%]: 时段末权益相对时段开始前一根 K 线收盘权益的收益（首个时段相对第一根 K 线）
+ - Max. Drawdown [%]: 时段内的最大回撤，峰值从时段期初权益算起
+ - # Trades / Win Rate [%] / Avg. Trade [%]: 按平仓时间归属的交易
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_FREQS = ('D', 'W', 'M', 'Q', 'Y')
+
+STABILITY_METRICS = [
+    'Periods', 'Positive Periods [%]', 'Avg. Period Return [%]', 'Period Return Std [%]',
+    'Worst Period [%]', 'Worst Period Drawdown [%]', 'Period Stability',
+]
+
+Freq = Union[str, Sequence]
+
+
+def period_codes(index: pd.DatetimeIndex, freq: Freq = 'M') -> Tuple[np.ndarray, pd.Index]:
+    """
+    把时间索引划分为时段，返回 (每根 K 线的时段编号, 各编号的时段名)。
+    不属于任何时段的 K 线编号为 -1（只在自定义分界点时出现）。
+    """
+    index = pd.DatetimeIndex(index)
+    if isinstance(freq, str) and freq.upper() in CALENDAR_FREQS:
+        codes, uniques = pd.factorize(index.to_period(freq.upper()))
+        return codes, pd.Index(uniques.astype(str))
+    if isinstance(freq, str):
+        try:
+            step = pd.Timedelta(freq)
+        except ValueError:
+            raise ValueError(f'不支持的时段: {freq}，可用 {"/".join(CALENDAR_FREQS)}、等长窗口如 10D，或分界点列表') from None
+        if step <= pd.Timedelta(0):
+            raise ValueError(f'时段长度必须为正: {freq}')
+        codes, uniques = pd.factorize(np.asarray((index - index[0]) // step))
+        return codes, pd.Index([str(index[0] + k * step) for k in uniques])
+
+    edges = pd.DatetimeIndex(pd.to_datetime(list(freq))).sort_values()
+    if len(edges) < 2:
+        raise ValueError('自定义时段至少需要两个分界点')
+    codes = edges.searchsorted(index, side='right') - 1
+    codes[codes >= len(edges) - 1] = -1
+    fmt = '%Y-%m-%d' if (edges == edges.normalize()).all() else '%Y-%m-%d %H:%M'
+    labels = [f'{a.strftime(fmt)}~{b.strftime(fmt)}' for a, b in zip(edges[:-1], edges[1:])]
+    return codes, pd.Index(labels)
+
+
+class PeriodSplitter:
+    """
+    同一份数据的时段划分。划分只与时间索引有关，范围回测中对所有参数组合复用。
+    时间索引有序，每个时段都是连续的一段 K 线：起止位置在这里算好，统计时按段切片求回撤、
+    用 bincount 汇总交易，不必每个组合都重新分组。
+    """
+
+    def __init__(self, index: pd.DatetimeIndex, freq: Freq = 'M'):
+        self.index = pd.DatetimeIndex(index)
+        self.freq = freq
+        self.codes, self.labels = period_codes(self.index, freq)
+        # 各时段在索引中的起止位置 [first, last]
+        valid = np.flatnonzero(self.codes >= 0)
+        breaks = np.flatnonzero(np.diff(self.codes[valid]) != 0) + 1
+        self.first = valid[np.r_[0, breaks]] if len(valid) else np.empty(0, np.int64)
+        self.last = valid[np.r_[breaks - 1, len(valid) - 1]] if len(valid) else np.empty(0, np.int64)
+        self.period_ids = self.codes[self.first]
+
+    def trade_codes(self, exit_times) -> np.ndarray:
+        """交易平仓时间所属的时段编号（平仓时间在数据范围之前的记为 -1）。"""
+        pos = self.index.searchsorted(pd.DatetimeIndex(exit_times), side='right') - 1
+        return np.where(pos >= 0, self.codes[np.maximum(pos, 0)], -1)
+
+    def stats(self, equity, trades: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        计算分时段统计。equity 为与索引等长的逐根权益；trades 需包含 ExitTime、PnL、ReturnPct 列
+        （与 backtesting.py 的 _trades 相同）。返回以时段名为索引的 DataFrame。
+        """
+        eq = np.asarray(equity, dtype=np.float64)
+        if len(eq) != len(self.index):
+            raise ValueError(f'权益长度 {len(eq)} 与时间索引长度 {len(self.index)} 不一致')
+        first, last = self.first, self.last
+
+        # 期初权益：时段开始前一根 K 线的收盘权益
+        base = eq[np.maximum(first - 1, 0)]
+        drawdown = np.empty(len(first))
+        for i, (a, b) in enumerate(zip(first, last + 1)):
+            peak = np.maximum.accumulate(eq[a:b])
+            np.maximum(peak, base[i], out=peak)
+            drawdown[i] = (eq[a:b] / peak).min() - 1
+
+        n_trades = np.zeros(len(first), np.int64)
+        win_rate = avg_trade = np.full(len(first), np.nan)
+        if trades is not None and len(trades):
+            # 时段编号 -> 第几个时段；多出的最后一格对应编号 -1（不属于任何时段）
+            slot = np.full(len(self.labels) + 1, -1)
+            slot[self.period_ids] = np.arange(len(first))
+            ts = slot[self.trade_codes(trades['ExitTime'])]
+            keep = ts >= 0
+            ts = ts[keep]
+            n_trades = np.bincount(ts, minlength=len(first))
+            wins = np.bincount(ts, trades['PnL'].to_numpy()[keep] > 0, minlength=len(first))
+            ret_sum = np.bincount(ts, trades['ReturnPct'].to_numpy()[keep], minlength=len(first))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                win_rate = np.where(n_trades > 0, wins / n_trades * 100, np.nan)
+                avg_trade = np.where(n_trades > 0, ret_sum / n_trades * 100, np.nan)
+
+        return pd.DataFrame({
+            'Start': self.index[first],
+            'End': self.index[last],
+            'Return [%]': (eq[last] / base - 1) * 100,
+            'Max. Drawdown [%]': drawdown * 100,
+            '# Trades': n_trades,
+            'Win Rate [%]': win_rate,
+            'Avg. Trade [%]': avg_trade,
+        }, index=pd.Index(self.labels[self.period_ids], name='Period'))
+
+
+def period_stats(equity: pd.Series, trades: Optional[pd.DataFrame] = None, freq: Freq = 'M') -> pd.DataFrame:
+    """单次使用的便捷函数：equity 为以时间为索引的权益序列。"""
+    return PeriodSplitter(equity.index, freq).stats(equity.to_numpy(), trades)
+
+
+def stability_summary(table: pd.DataFrame) -> Dict[str, float]:
+    """
+    把分时段统计压缩为几个标量，用于在范围回测中比较各组参数的稳定性:
+    盈利时段占比、时段收益的均值 / 标准差 / 最差值、最差时段回撤，
+    以及 Period Stability = 时段收益均值 / 标准差（越大说明收益越均匀）。
+    """
+    returns = table['Return [%]']
+    std = returns.std() if len(returns) > 1 else np.nan
+    return {
+        'Periods': len(returns),
+        'Positive Periods [%]': (returns > 0).mean() * 100 if len(returns) else np.nan,
+        'Avg. Period Return [%]': returns.mean(),
+        'Period Return Std [%]': std,
+        'Worst Period [%]': returns.min(),
+        'Worst Period Drawdown [%]': table['Max. Drawdown [%]'].min(),
+        'Period Stability': returns.mean() / std if std and not np.isnan(std) else np.nan,
+    }
+
+
+def period_returns_table(
+    runs: List[Tuple[Dict, Dict[str, float]]],
+    rank_by: str = 'Period Stability',
+) -> pd.DataFrame:
+    """
+    范围回测的紧凑汇总：每组参数一行，参数列 + 稳定性指标 + 各时段收益率列，按 rank_by 从高到低排序。
+    runs: [(参数及稳定性指标字典, {时段名: 收益率}), ...]
+    """
+    rows = [{**info, **{str(k): v for k, v in returns.items()}} for info, returns in runs]
+    table = pd.DataFrame(rows)
+    if rank_by in table.columns:
+        table = table.sort_values(rank_by, ascending=False, na_position='last', kind='stable')
+    return table.reset_index(drop=True)
@@ -0,0 +1,402 @@
+"""
+resultStore.py
+
+回测结果库：把每次范围回测的结果写入同一个 SQLite 数据库（默认 result/results.db），
+并提供基于索引的查询接口和命令行工具，不必再逐个读取 result/many 下的 CSV。
+
+表结构：
+ - runs:          每次批量回测一行（run_id, 创建时间, 数据集, 策略, 已写入的结果数）
+ - results:       每个参数组合一行，常用指标为独立的带索引列，全部标量指标另存 JSON
+ - result_params: 参数的纵表 (result_id, name, value)，按 (name, value) 建索引，用于按任意参数分组
+ - param_stats:   写入时维护的聚合表，按 (参数, 取值, 指标) 记录每个 run 的 n/min/max/sum，
+                  "某参数各取值下的最优指标" 这类查询只需扫描它，不随结果总行数增长
+
+命令行示例：
+    python -m tool.resultStore best --metric "Return [%]" --dataset 2025 --limit 10
+    python -m tool.resultStore by ema_period --metric "Return [%]" --dataset 2025
+    python -m tool.resultStore runs
+    python -m tool.resultStore import result/many/grid_summary_20250901_120000.csv --dataset btc_usdt_24-至今
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import sqlite3
+import uuid
+from typing import Optional, Dict, Any, List, Iterable
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DB_PATH = os.path.join('result', 'results.db')
+
+# backtesting.py 统计字段 -> results 表中的独立列（带索引，查询最快）
+METRIC_COLUMNS = {
+    'Equity Final [$]': 'equity_final',
+    'Return [%]': 'return_pct',
+    '# Trades': 'n_trades',
+    'Win Rate [%]': 'win_rate',
+    'Max. Drawdown [%]': 'max_drawdown',
+    'Sharpe Ratio': 'sharpe',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id     TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    dataset    TEXT NOT NULL,
+    strategy   TEXT NOT NULL,
+    n_results  INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_dataset ON runs (dataset, strategy);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at);
+
+CREATE TABLE IF NOT EXISTS results (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id       TEXT NOT NULL REFERENCES runs (run_id),
+    dataset      TEXT NOT NULL,
+    strategy     TEXT NOT NULL,
+    params       TEXT NOT NULL,
+    equity_final REAL,
+    return_pct   REAL,
+    n_trades     INTEGER,
+    win_rate     REAL,
+    max_drawdown REAL,
+    sharpe       REAL,
+    metrics      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_dataset ON results (dataset, strategy);
+
+CREATE TABLE IF NOT EXISTS result_params (
+    result_id INTEGER NOT NULL REFERENCES results (id),
+    name      TEXT NOT NULL,
+    value,
+    PRIMARY KEY (result_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_params_name_value ON result_params (name, value);
+
+CREATE TABLE IF NOT EXISTS param_stats (
+    name   TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    value,
+    n      INTEGER NOT NULL,
+    vmin   REAL,
+    vmax   REAL,
+    vsum   REAL,
+    PRIMARY KEY (name, metric, run_id, value)
+) WITHOUT ROWID;
+"""
+
+# 每个常用指标两条索引：全局排序用 (指标)，按 run 取 top-k 用 (run_id, 指标)
+_SCHEMA += ''.join(
+    f'CREATE INDEX IF NOT EXISTS idx_results_{col} ON results ({col});\n'
+    f'CREATE INDEX IF NOT EXISTS idx_results_run_{col} ON results (run_id, {col});\n'
+    for col in METRIC_COLUMNS.values())
+
+_UPSERT_PARAM_STATS = """
+INSERT INTO param_stats (name, metric, run_id, value, n, vmin, vmax, vsum) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (name, metric, run_id, value) DO UPDATE SET
+    n = n + excluded.n,
+    vmin = MIN(COALESCE(vmin, excluded.vmin), COALESCE(excluded.vmin, vmin)),
+    vmax = MAX(COALESCE(vmax, excluded.vmax), COALESCE(excluded.vmax, vmax)),
+    vsum = COALESCE(vsum, 0) + COALESCE(excluded.vsum, 0)
+"""
+
+
+def scalar_metrics(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """从 backtesting 统计结果中挑出可存储的标量指标（跳过 _trades 等内部字段）。"""
+    out = {}
+    for key, value in stats.items():
+        if str(key).startswith('_'):
+            continue
+        if isinstance(value, (pd.Timestamp, pd.Timedelta, datetime.datetime, datetime.timedelta)):
+            out[str(key)] = str(value)
+            continue
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            out[str(key)] = None if isinstance(value, float) and math.isnan(value) else value
+    return out
+
+
+def _metric_column(metric: str) -> Optional[str]:
+    """常用指标对应的 results 列名（接受统计字段名或列名），其他指标返回 None。"""
+    if metric in METRIC_COLUMNS:
+        return METRIC_COLUMNS[metric]
+    if metric in METRIC_COLUMNS.values():
+        return metric
+    return None
+
+
+def _metric_expr(metric: str) -> str:
+    """把指标名转换为 SQL 表达式：常用指标走带索引的独立列，其余从 JSON 中取。"""
+    column = _metric_column(metric)
+    if column is not None:
+        return f'r.{column}'
+    path = '$."' + metric.replace('"', '\\"') + '"'
+    return "json_extract(r.metrics, '" + path.replace("'", "''") + "')"
+
+
+class ResultStore:
+    """
+    结果库的读写封装。可用作上下文管理器：
+        with ResultStore() as store:
+            run_id = store.start_run('btc_usdt_24-至今', 'EMA_2ATR')
+            store.add_result(run_id, {'ema_period': 9, ...}, stats)
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # check_same_thread=False: GUI 在后台线程中写入
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL 模式下读写互不阻塞，回测写入的同时可以查询
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """旧库的 runs 表没有 n_results 列：补上并按 results 回填一次。"""
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(runs)')}
+        if 'n_results' not in columns:
+            with self.conn:
+                self.conn.execute('ALTER TABLE runs ADD COLUMN n_results INTEGER NOT NULL DEFAULT 0')
+                self.conn.execute(
+                    'UPDATE runs SET n_results = (SELECT COUNT(*) FROM results WHERE results.run_id = runs.run_id)')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- 写入 ---
+
+    def start_run(self, dataset: str, strategy: str, run_id: Optional[str] = None) -> str:
+        """登记一次批量回测，返回 run_id。"""
+        if run_id is None:
+            run_id = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_') + uuid.uuid4().hex[:6]
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR IGNORE INTO runs (run_id, created_at, dataset, strategy) VALUES (?, ?, ?, ?)',
+                (run_id, datetime.datetime.now().isoformat(timespec='seconds'), dataset, strategy))
+        return run_id
+
+    def add_results(self, run_id: str, rows: Iterable[Dict[str, Any]]):
+        """
+        批量写入结果。每行为 {'params': {...}, 'stats': {...}}，stats 可以是 backtesting 的统计 Series。
+        """
+        dataset, strategy = self.conn.execute(
+            'SELECT dataset, strategy FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+        count = 0
+        with self.conn:
+            for row in rows:
+                params = {k: (v.item() if hasattr(v, 'item') else v) for k, v in row['params'].items()}
+                metrics = scalar_metrics(row['stats'])
+                cur = self.conn.execute(
+                    'INSERT INTO results (run_id, dataset, strategy, params, equity_final, return_pct, '
+                    'n_trades, win_rate, max_drawdown, sharpe, metrics) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (run_id, dataset, strategy, json.dumps(params, ensure_ascii=False),
+                     *(metrics.get(k) for k in METRIC_COLUMNS),
+                     json.dumps(metrics, ensure_ascii=False)))
+                self.conn.executemany(
+                    'INSERT INTO result_params (result_id, name, value) VALUES (?, ?, ?)',
+                    [(cur.lastrowid, k, v) for k, v in params.items()])
+                self.conn.executemany(_UPSERT_PARAM_STATS, [
+                    (k, col, run_id, v, int(m is not None), m, m, m)
+                    for k, v in params.items()
+                    for col, m in zip(METRIC_COLUMNS.values(), (metrics.get(key) for key in METRIC_COLUMNS))])
+                count += 1
+            # 结果数记在 runs 上，列出批量回测时不必对 results 做 COUNT(*)
+            self.conn.execute('UPDATE runs SET n_results = n_results + ? WHERE run_id = ?', (count, run_id))
+
+    def add_result(self, run_id: str, params: Dict[str, Any], stats: Dict[str, Any]):
+        """写入单个参数组合的结果（立即提交，便于边回测边查看）。"""
+        self.add_results(run_id, [{'params': params, 'stats': stats}])
+
+    def import_summary_csv(self, csv_path: str, dataset: str, strategy: str = 'EMA_2ATR',
+                           param_columns: Iterable[str] = ('ema_period', 'atr1', 'atr2')) -> str:
+        """把旧的 grid_summary_*.csv 导入结果库（以文件名作为 run_id，重复导入会跳过），返回 run_id。"""
+        run_id = os.path.splitext(os.path.basename(csv_path))[0]
+        if self.conn.execute('SELECT 1 FROM runs WHERE run_id = ?', (run_id,)).fetchone():
+            return run_id  # 已导入过
+        df = pd.read_csv(csv_path)
+        param_columns = [c for c in param_columns if c in df.columns]
+        self.start_run(dataset, strategy, run_id=run_id)
+        records = df.to_dict('records')
+        self.add_results(run_id, [
+            {'params': {c: rec[c] for c in param_columns},
+             'stats': {k: v for k, v in rec.items() if k not in param_columns}}
+            for rec in records])
+        return run_id
+
+    # --- 查询 ---
+
+    @staticmethod
+    def _run_clauses(dataset: Optional[str], strategy: Optional[str], alias: str = 'runs'):
+        """runs 表（别名 alias）的筛选条件列表及参数。dataset 按子串匹配。"""
+        clauses, args = [], []
+        if dataset:
+            clauses.append(f"{alias}.dataset LIKE '%' || ? || '%'")
+            args.append(dataset)
+        if strategy:
+            clauses.append(f'{alias}.strategy = ?')
+            args.append(strategy)
+        return clauses, args
+
+    def _run_filter(self, dataset: Optional[str], strategy: Optional[str]):
+        """在体量很小的 runs 表中筛选 run_id 的子查询。"""
+        clauses, args = self._run_clauses(dataset, strategy)
+        return f"SELECT run_id FROM runs WHERE {' AND '.join(clauses)}", args
+
+    def _filters(self, dataset: Optional[str], strategy: Optional[str], run_id: Optional[str]):
+        """构造 results 表 (别名 r) 的筛选条件列表及参数。"""
+        clauses, args = [], []
+        if run_id:
+            clauses.append('r.run_id = ?')
+            args.append(run_id)
+        if dataset or strategy:
+            sub_sql, sub_args = self._run_filter(dataset, strategy)
+            clauses.append(f'r.run_id IN ({sub_sql})')
+            args.extend(sub_args)
+        return clauses, args
+
+    def best(self, metric: str = 'Return [%]', dataset: Optional[str] = None, strategy: Optional[str] = None,
+             run_id: Optional[str] = None, limit: int = 10, ascending: bool = False) -> pd.DataFrame:
+        """按指标排序返回前 limit 个参数组合。"""
+        expr = _metric_expr(metric)
+        order = 'ASC' if ascending else 'DESC'
+        if run_id:
+            clauses, args = ['r.run_id = ?'], [run_id]
+        else:
+            clauses, args = self._run_clauses(dataset, strategy, 'u')
+        source = 'results r JOIN runs u ON u.run_id = r.run_id' if clauses and not run_id else 'results r'
+        column = _metric_column(metric)
+        if column is not None and clauses and not run_id and self._filter_is_sparse(clauses, args, limit):
+            # 匹配的结果很少：先筛 run，再用 (run_id, 指标) 索引读出这些 run 的结果排序；
+            # 否则沿指标索引从最优往下扫，遇到 limit 个匹配的行即停止
+            source = f'runs u CROSS JOIN results r INDEXED BY idx_results_run_{column} ON r.run_id = u.run_id'
+        clauses.append(f'{expr} IS NOT NULL')
+        sql = (f'SELECT r.run_id, r.dataset, r.strategy, r.params, {expr} FROM {source} '
+               f"WHERE {' AND '.join(clauses)} ORDER BY {expr} {order} LIMIT ?")
+        rows = self.conn.execute(sql, args + [limit]).fetchall()
+        df = pd.DataFrame(rows, columns=['run_id', 'dataset', 'strategy', 'params', metric])
+        params = pd.DataFrame([json.loads(p) for p in df.pop('params')], index=df.index)
+        return pd.concat([params, df], axis=1)
+
+    def _filter_is_sparse(self, run_clauses: List[str], args: List[Any], limit: int) -> bool:
+        """
+        根据 runs 上记录的结果数判断筛选是否稀疏。沿指标索引扫描约需读 limit * 总数 / 匹配数 行，
+        先筛 run 需读全部匹配的行，取两者中较少的一种。
+        """
+        total, matched = self.conn.execute(
+            f"SELECT SUM(n_results), SUM(CASE WHEN {' AND '.join(run_clauses)} THEN n_results ELSE 0 END) "
+            'FROM runs u', args).fetchone()
+        matched = matched or 0
+        return matched * matched < limit * (total or 0)
+
+    def best_by(self, param: str, metric: str = 'Return [%]', dataset: Optional[str] = None,
+                strategy: Optional[str] = None, run_id: Optional[str] = None, agg: str = 'max') -> pd.DataFrame:
+        """按某个参数的取值分组，返回每组指标的聚合值（agg: max/min/avg）及样本数。"""
+        if agg not in ('max', 'min', 'avg'):
+            raise ValueError(f'不支持的聚合方式: {agg}')
+        column = _metric_column(metric)
+        if column is not None:
+            # 常用指标直接走聚合表
+            clauses, args = self._filters(dataset, strategy, run_id)
+            clauses = [c.replace('r.run_id', 's.run_id') for c in clauses]
+            clauses[:0] = ['s.name = ?', 's.metric = ?']
+            value = {'max': 'MAX(s.vmax)', 'min': 'MIN(s.vmin)', 'avg': 'SUM(s.vsum) / SUM(s.n)'}[agg]
+            sql = (f'SELECT s.value, {value}, SUM(s.n) FROM param_stats s '
+                   f"WHERE {' AND '.join(clauses)} GROUP BY s.value ORDER BY s.value")
+            rows = self.conn.execute(sql, [param, column] + args).fetchall()
+            return pd.DataFrame(rows, columns=[param, f'{agg}({metric})', 'n'])
+
+        expr = _metric_expr(metric)
+        clauses, args = self._filters(dataset, strategy, run_id)
+        clauses.insert(0, 'p.name = ?')
+        sql = (f'SELECT p.value, {agg.upper()}({expr}), COUNT(*) '
+               'FROM result_params p JOIN results r ON r.id = p.result_id '
+               f"WHERE {' AND '.join(clauses)} GROUP BY p.value ORDER BY p.value")
+        rows = self.conn.execute(sql, [param] + args).fetchall()
+        return pd.DataFrame(rows, columns=[param, f'{agg}({metric})', 'n'])
+
+    def runs(self, dataset: Optional[str] = None, strategy: Optional[str] = None) -> pd.DataFrame:
+        """列出已记录的批量回测及其结果数（读 runs 上维护的计数，不扫描 results）。"""
+        clauses, args = self._run_clauses(dataset, strategy)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        sql = f'SELECT run_id, created_at, dataset, strategy, n_results FROM runs {where} ORDER BY created_at, rowid'
+        rows = self.conn.execute(sql, args).fetchall()
+        return pd.DataFrame(rows, columns=['run_id', 'created_at', 'dataset', 'strategy', 'n'])
+
+    def latest_run(self) -> Optional[tuple]:
+        """最近一次批量回测的 (run_id, dataset)，没有记录时返回 None。只读索引上的一行，适合定时轮询。"""
+        return self.conn.execute(
+            'SELECT run_id, dataset FROM runs ORDER BY created_at DESC, rowid DESC LIMIT 1').fetchone()
+
+    def load_run(self, run_id: str, since_id: int = 0) -> pd.DataFrame:
+        """读取某次批量回测的全部结果（参数 + 常用指标），since_id 用于增量读取新写入的行。"""
+        rows = self.conn.execute(
+            f"SELECT id, params, {', '.join(METRIC_COLUMNS.values())} FROM results "
+            'WHERE run_id = ? AND id > ? ORDER BY id', (run_id, since_id)).fetchall()
+        df = pd.DataFrame(rows, columns=['id', 'params'] + list(METRIC_COLUMNS))
+        params = pd.DataFrame([json.loads(p) for p in df.pop('params')], index=df.index)
+        return pd.concat([params, df], axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查询回测结果库')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='结果库路径')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_filters(p):
+        p.add_argument('--metric', default='Return [%]')
+        p.add_argument('--dataset', help='数据集名称子串，例如 2025')
+        p.add_argument('--strategy')
+        p.add_argument('--run-id')
+
+    p_best = sub.add_parser('best', help='按指标排序的最优参数组合')
+    add_filters(p_best)
+    p_best.add_argument('--limit', type=int, default=10)
+    p_best.add_argument('--asc', action='store_true', help='升序（例如查回撤最小）')
+
+    p_by = sub.add_parser('by', help='按参数取值分组的最优指标')
+    p_by.add_argument('param')
+    add_filters(p_by)
+    p_by.add_argument('--agg', default='max', choices=['max', 'min', 'avg'])
+
+    p_runs = sub.add_parser('runs', help='列出已记录的批量回测')
+    p_runs.add_argument('--dataset')
+    p_runs.add_argument('--strategy')
+
+    p_import = sub.add_parser('import', help='导入旧的 grid_summary CSV')
+    p_import.add_argument('csv', nargs='+')
+    p_import.add_argument('--dataset', required=True)
+    p_import.add_argument('--strategy', default='EMA_2ATR')
+
+    args = parser.parse_args()
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        with ResultStore(args.db) as store:
+            if args.command == 'best':
+                print(store.best(args.metric, args.dataset, args.strategy, args.run_id, args.limit, args.asc).to_string(index=False))
+            elif args.command == 'by':
+                print(store.best_by(args.param, args.metric, args.dataset, args.strategy, args.run_id, args.agg).to_string(index=False))
+            elif args.command == 'runs':
+                print(store.runs(args.dataset, args.strategy).to_string(index=False))
+            elif args.command == 'import':
+                for path in args.csv:
+                    print(f'已导入 {path} -> run_id={store.import_summary_csv(path, args.dataset, args.strategy)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,530 @@
+"""
+sweepRunner.py
+
+通用范围回测执行器。任何在 config.json 中声明了参数空间 (tool.paramSpace) 的策略，
+只需在 logic_module 中提供一个评估函数:
+
+    evaluate(df, params: dict, indicators: dict) -> Optional[dict]
+
+返回单个参数组合的统计结果（可附带逐笔收益率 '_trade_returns'），
+即可使用这里的网格生成、指标缓存、多进程并行、断点续跑、结果库和稳健性分析：
+
+ - 网格: 影响指标的参数放在最外层循环，相邻组合共享指标
+ - 指标缓存: 按 (指标名, 依赖参数取值) 缓存，每个指标对每组依赖参数只计算一次
+ - 并行: workers > 1 时按指标依赖分组切块交给进程池，各进程内存映射同一份数据 (tool.dataCache)
+ - 断点续跑: 每个结果立即追加到 result/many/checkpoint_<策略>_<指纹>.jsonl，
+   中止或崩溃后用相同的策略、数据和参数再次运行即从断点继续，全部完成后删除该文件
+ - 快速模式: 策略可在配置中再登记一个同签名的 "fast_evaluate_func"（例如基于 tool.fillKernel 的撮合内核），
+   run_sweep(fast=True) / --fast 时使用
+ - 分时段稳定性: 评估函数返回逐根权益 '_equity' 和交易记录 '_trades' 时，period='M' / 'Q' 等可按时段
+   统计每个组合 (tool.periodStats)，汇总中附带稳定性指标，并另存按稳定性排序的各时段收益表
+
+用法:
+    python -m tool.sweepRunner EMA_2ATR btc_usdt_24-至今 --set ema_period=10-50 --set atr1=1,2 --set atr2=2,3 --workers 4
+"""
+
+import os
+import json
+import heapq
+import argparse
+import datetime
+import importlib
+import itertools
+import threading
+import queue
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, List, Tuple, Union
+
+import pandas as pd
+
+from tool.paramSpace import ParamSpace
+from tool.dataDeal import prepare_cleaned_csv, _log
+from tool.dataCache import load_ohlcv, reset_peak_rss, peak_rss_mb
+from tool.resultStore import ResultStore, DEFAULT_DB_PATH, scalar_metrics
+from tool.robustness import robustness_table
+from tool.periodStats import PeriodSplitter, period_codes, stability_summary, period_returns_table, STABILITY_METRICS
+
+SUMMARY_METRICS = ['Equity Final [$]', 'Return [%]', '# Trades', 'Win Rate [%]', 'Peak RSS [MB]']
+
+CHECKPOINT_DIR = 'result/many'
+
+
+def _resolve_space(strategy: Union[str, ParamSpace]) -> ParamSpace:
+    return strategy if isinstance(strategy, ParamSpace) else ParamSpace.from_config(strategy)
+
+
+def _evaluate_func_name(strategy_config: Dict[str, Any], fast: bool) -> str:
+    """fast=True 时使用配置中的 fast_evaluate_func，否则使用 evaluate_func。"""
+    if not fast:
+        return strategy_config['evaluate_func']
+    if 'fast_evaluate_func' not in strategy_config:
+        raise ValueError(f'策略 {strategy_config["name"]} 没有配置 fast_evaluate_func，不能使用快速模式')
+    return strategy_config['fast_evaluate_func']
+
+
+# --- 指标缓存 ---
+
+class IndicatorCache:
+    """
+    按依赖参数缓存指标数组。网格已按依赖参数排好序，顺序执行时只需保留最近的少量条目。
+    """
+
+    def __init__(self, space: ParamSpace, module, df: pd.DataFrame, max_entries: int = 32):
+        self.space = space
+        self.df = df
+        self.max_entries = max_entries
+        self.funcs = {name: getattr(module, ind['func']) for name, ind in space.indicators.items()}
+        self._cache: 'OrderedDict[Tuple, Any]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        out = {}
+        for name, ind in self.space.indicators.items():
+            key = self.space.indicator_key(name, params)
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                inputs = [self.df[col].to_numpy() for col in ind.get('inputs', ['Close'])]
+                kwargs = {arg: params[p] for arg, p in ind.get('params', {}).items()}
+                self._cache[key] = self.funcs[name](*inputs, **kwargs)
+                self.misses += 1
+                if len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            out[name] = self._cache[key]
+        return out
+
+
+def _evaluate(
+    evaluate_func,
+    cache: IndicatorCache,
+    df: pd.DataFrame,
+    params: Dict[str, Any],
+    splitter: Optional[PeriodSplitter] = None,
+    trade_returns: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    评估一个参数组合，附带本次峰值内存；给出 splitter 时附带分时段稳定性指标和各时段收益 '_period_returns'。
+    逐笔收益率 '_trade_returns' 只在 trade_returns=True（需要稳健性分析）时保留。
+    """
+    reset_peak_rss()
+    stats = evaluate_func(df, params, cache.get(params))
+    if stats is None:
+        return None
+    stats['Peak RSS [MB]'] = peak_rss_mb()
+    if not trade_returns:
+        stats.pop('_trade_returns', None)
+    # 逐根权益和交易记录只用于分时段统计，用完即丢弃，结果中只保留标量和各时段收益
+    equity, trades = stats.pop('_equity', None), stats.pop('_trades', None)
+    if splitter is not None and equity is not None:
+        table = splitter.stats(equity, trades)
+        stats.update(stability_summary(table))
+        stats['_period_returns'] = table['Return [%]'].to_dict()
+    return stats
+
+
+# --- 进程池 worker ---
+
+# 子进程中的评估环境：行情数据（内存映射，只读）、评估函数、指标缓存和时段划分
+_WORKER: Dict[str, Any] = {}
+
+def _init_worker(strategy_config: Dict[str, Any], cleaned_path: str, dtype: str, evaluate_func: str,
+                 period: Optional[Union[str, List[str]]] = None, trade_returns: bool = False):
+    space = ParamSpace(strategy_config)
+    module = importlib.import_module(space.logic_module)
+    df = load_ohlcv(cleaned_path, dtype)
+    _WORKER.update(df=df, evaluate=getattr(module, evaluate_func),
+                   cache=IndicatorCache(space, module, df),
+                   splitter=PeriodSplitter(df.index, period) if period else None,
+                   trade_returns=trade_returns)
+
+def _evaluate_chunk(chunk: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    out = []
+    for params in chunk:
+        try:
+            stats = _evaluate(_WORKER['evaluate'], _WORKER['cache'], _WORKER['df'], params, _WORKER['splitter'],
+                              _WORKER['trade_returns'])
+        except Exception as e:
+            print(f'回测出错: {params} - {e}')
+            stats = None
+        out.append((params, stats))
+    return out
+
+
+def _chunk_grid(space: ParamSpace, grid: List[Dict[str, Any]], chunk_size: int) -> List[List[Dict[str, Any]]]:
+    """按指标依赖分组切块：同一块内的组合共享指标，大组再按 chunk_size 拆开以均衡负载。"""
+    chunks, current, current_key = [], [], None
+    for params in grid:
+        key = space.group_key(params)
+        if current and (key != current_key or len(current) >= chunk_size):
+            chunks.append(current)
+            current = []
+        current.append(params)
+        current_key = key
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# --- 断点续跑 ---
+
+def checkpoint_path(space: ParamSpace, csv_name: str, values: Dict[str, List[Any]], dtype: str,
+                    fast: bool = False, period: Optional[Union[str, List[str]]] = None,
+                    robustness: bool = False) -> str:
+    # 快速模式、分时段统计、稳健性分析（断点中带逐笔收益率）的记录字段不同，使用单独的断点文件
+    extra = {'fast': True} if fast else {}
+    if period:
+        extra['period'] = period if isinstance(period, str) else [str(p) for p in period]
+    if robustness:
+        extra['robustness'] = True
+    return os.path.join(CHECKPOINT_DIR, f'checkpoint_{space.name}_{space.fingerprint(csv_name, values, dtype=dtype, **extra)}.jsonl')
+
+
+def _load_checkpoint(path: str) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """读取断点文件，返回 (run_id, 已完成的结果)。崩溃时写了一半的最后一行会被忽略。"""
+    run_id, rows = None, []
+    with open(path, 'r', encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if i == 0 and 'run_id' in record:
+                run_id = record['run_id']
+            elif 'params' in record:
+                rows.append(record)
+    return run_id, rows
+
+
+def _json_stats(stats: Dict[str, Any], trade_returns: bool = False) -> Dict[str, Any]:
+    """评估结果中可写入 JSON 的部分：标量统计、各时段收益，以及 trade_returns=True 时的逐笔收益率。"""
+    out = scalar_metrics(stats)
+    if trade_returns and stats.get('_trade_returns') is not None:
+        out['_trade_returns'] = [float(r) for r in stats['_trade_returns']]
+    if stats.get('_period_returns') is not None:
+        out['_period_returns'] = {k: float(v) for k, v in stats['_period_returns'].items()}
+    return out
+
+
+def _checkpoint_record(params: Dict[str, Any], stats: Optional[Dict[str, Any]], trade_returns: bool = False) -> str:
+    """断点中的一行。逐笔收益率只在需要稳健性分析 (trade_returns=True) 时写入。"""
+    record = {'params': params, 'stats': _json_stats(stats, trade_returns) if stats is not None else None}
+    return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+# --- 汇总输出 ---
+
+def save_grid_summary(results: List[Dict[str, Any]], param_names: List[str], log_queue: Optional[queue.Queue] = None) -> str:
+    """把批量回测结果（统计 + 参数）精简后保存为 result/many/grid_summary_<时间>.csv，返回文件路径。"""
+    df_result = pd.DataFrame(results)
+    columns = list(param_names) + SUMMARY_METRICS + STABILITY_METRICS
+    df_simple = df_result[[c for c in columns if c in df_result.columns]]
+
+    ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_path = f'result/many/grid_summary_{ts}.csv'
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    df_simple.to_csv(output_path, index=False)
+    _log(log_queue, f'批量回测结果已保存: {os.path.abspath(output_path)}')
+    return output_path
+
+
+def save_robustness_summary(
+    results: List[Dict[str, Any]],
+    param_names: List[str],
+    top: int,
+    metric: str = 'Return [%]',
+    n_sims: int = 5000,
+    method: str = 'bootstrap',
+    log_queue: Optional[queue.Queue] = None
+) -> Optional[str]:
+    """
+    对批量回测中 metric 排名前 top 的组合做蒙特卡洛分析，保存为 result/many/robustness_<时间>.csv。
+    results 中只有带 '_trade_returns' 的结果参与排名（run_sweep 只传入它保留的前 top 名）。
+    """
+    ranked = [r for r in results if r.get('_trade_returns') is not None and pd.notna(r.get(metric))]
+    ranked.sort(key=lambda r: r[metric], reverse=True)
+    ranked = ranked[:top]
+    if not ranked:
+        _log(log_queue, '没有可做稳健性分析的结果（缺少逐笔收益）。')
+        return None
+
+    _log(log_queue, f'稳健性分析: {metric} 前 {len(ranked)} 名, 每组 {n_sims} 次 {method} 抽样')
+    runs = [({n: r[n] for n in param_names}, r['_trade_returns']) for r in ranked]
+    df_robust = robustness_table(runs, n_sims, method)
+
+    ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_path = f'result/many/robustness_{ts}.csv'
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    df_robust.to_csv(output_path, index=False)
+    _log(log_queue, f'稳健性分析结果已保存: {os.path.abspath(output_path)}')
+    return output_path
+
+
+def save_period_summary(
+    results: List[Dict[str, Any]],
+    param_names: List[str],
+    rank_by: str = 'Period Stability',
+    log_queue: Optional[queue.Queue] = None
+) -> Optional[str]:
+    """把各组合的稳定性指标和各时段收益率按 rank_by 排序，保存为 result/many/periods_<时间>.csv。"""
+    runs = [({**{n: r[n] for n in param_names}, **{m: r.get(m) for m in STABILITY_METRICS}}, r['_period_returns'])
+            for r in results if r.get('_period_returns') is not None]
+    if not runs:
+        _log(log_queue, '没有分时段统计结果（评估函数未返回 _equity）。')
+        return None
+
+    df_periods = period_returns_table(runs, rank_by)
+    ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_path = f'result/many/periods_{ts}.csv'
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    df_periods.to_csv(output_path, index=False)
+    _log(log_queue, f'分时段收益表已保存 (按 {rank_by} 排序): {os.path.abspath(output_path)}')
+    return output_path
+
+
+# --- 执行入口 ---
+
+def run_sweep(
+    strategy: Union[str, ParamSpace],
+    csv_name: str,
+    values: Dict[str, List[Any]],
+    save_summary: bool = True,
+    workers: int = 1,
+    dtype: str = 'float64',
+    resume: bool = True,
+    fast: bool = False,
+    period: Optional[Union[str, List[str]]] = None,
+    period_rank: str = 'Period Stability',
+    chunk_size: int = 16,
+    stop_event: Optional[threading.Event] = None,
+    log_queue: Optional[queue.Queue] = None,
+    store_path: Optional[str] = DEFAULT_DB_PATH,
+    robustness_top: int = 0,
+    robustness_metric: str = 'Return [%]',
+    robustness_sims: int = 5000,
+    robustness_method: str = 'bootstrap',
+) -> Optional[str]:
+    """
+    对 strategy（策略名或 ParamSpace）在 values 给出的参数取值上执行范围回测，
+    返回 grid_summary CSV 路径（中止或无结果时返回 None）。
+
+    每个组合的结果写入结果库 store_path（传 None 则不写）；resume=True 时从上次中断处继续。
+    fast=True 时使用策略配置的 fast_evaluate_func，只输出其给出的统计量。
+    period 给出时段划分（'M'、'Q'、'10D' 或分界点列表，见 tool.periodStats）时，每个组合附带分时段稳定性指标，
+    并另存按 period_rank 排序的各时段收益表 periods_<时间>.csv。
+    robustness_top > 0 时对 robustness_metric 排名前 N 的组合做蒙特卡洛稳健性分析 (tool.robustness)；
+    回测过程中只保留这 N 个组合的逐笔收益率，否则一律丢弃。
+    """
+    space = _resolve_space(strategy)
+    evaluate_name = _evaluate_func_name(space.config, fast)
+    if period:
+        period_codes(pd.DatetimeIndex(['2000-01-01']), period)  # 时段写法有误时在启动前报错
+    values = {n: list(values[n]) for n in space.names}
+    grid = space.build_grid(values)
+    total = len(grid)
+    _log(log_queue, f'准备运行 {total} 次组合回测{"（快速撮合内核）" if fast else ""}...')
+
+    cleaned_path = prepare_cleaned_csv(csv_name, stop_event, log_queue)
+    if cleaned_path is None:
+        return None
+
+    # 断点续跑：跳过已完成的组合，沿用原来的 run_id
+    ckpt_path = checkpoint_path(space, csv_name, values, dtype, fast, period, robustness_top > 0)
+    run_id, done_rows = None, []
+    if resume and os.path.isfile(ckpt_path):
+        run_id, done_rows = _load_checkpoint(ckpt_path)
+        _log(log_queue, f'从断点继续: 已完成 {len(done_rows)}/{total} ({ckpt_path})')
+    done_keys = {tuple(row['params'][n] for n in space.names) for row in done_rows}
+    todo = [p for p in grid if tuple(p[n] for n in space.names) not in done_keys]
+
+    store = ResultStore(store_path) if store_path else None
+    if store:
+        run_id = store.start_run(csv_name, space.name, run_id)
+        _log(log_queue, f'结果同时写入结果库: {store_path} (run_id={run_id})')
+    os.makedirs(os.path.dirname(ckpt_path), exist_ok=True)
+    if not done_rows:
+        with open(ckpt_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'run_id': run_id, 'strategy': space.name, 'dataset': csv_name}) + '\n')
+    ckpt = open(ckpt_path, 'a', encoding='utf-8')
+
+    results = []
+    # 稳健性分析只用到排名前 robustness_top 的逐笔收益率：用大小为 N 的小顶堆保留，其余组合的逐笔收益率立即丢弃。
+    # 指标相同时先完成的组合优先，与按指标稳定排序后取前 N 名一致
+    top_returns: List[Tuple[Any, int, Dict[str, Any]]] = []
+    seq = itertools.count()
+
+    def add_result(row: Dict[str, Any]):
+        trade_returns = row.pop('_trade_returns', None)
+        results.append(row)
+        if robustness_top <= 0 or trade_returns is None or pd.isna(row.get(robustness_metric)):
+            return
+        item = (row[robustness_metric], -next(seq), {**row, '_trade_returns': trade_returns})
+        if len(top_returns) < robustness_top:
+            heapq.heappush(top_returns, item)
+        else:
+            heapq.heappushpop(top_returns, item)
+
+    for row in done_rows:
+        if row['stats'] is not None:
+            add_result({**row['stats'], **row['params']})
+    count = len(done_rows)
+    failed_chunks = 0
+    pool_broken = False
+    start_time = datetime.datetime.now()
+
+    def collect(params: Dict[str, Any], stats: Optional[Dict[str, Any]]):
+        nonlocal count
+        count += 1
+        elapsed = datetime.datetime.now() - start_time
+        finished_here = count - len(done_rows)
+        eta = elapsed / finished_here * (total - count)
+        eta_str = str(datetime.timedelta(seconds=int(eta.total_seconds())))
+        desc = ', '.join(f'{k}={v}' for k, v in params.items())
+        _log(log_queue, f'[{count}/{total}] {desc} | 预计剩余: {eta_str}')
+
+        ckpt.write(_checkpoint_record(params, stats, robustness_top > 0))
+        ckpt.flush()
+        if stats is not None:
+            if store:
+                store.add_result(run_id, params, stats)
+            add_result({**stats, **params})
+
+    try:
+        if workers > 1 and todo:
+            chunks = _chunk_grid(space, todo, chunk_size)
+            _log(log_queue, f'使用 {workers} 个进程并行回测 ({len(chunks)} 个任务块)')
+            # 先在主进程构建 .npy 缓存，各 worker 初始化时只做内存映射
+            load_ohlcv(cleaned_path, dtype)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(space.config, cleaned_path, dtype, evaluate_name, period,
+                                               robustness_top > 0)) as pool:
+                futures = [pool.submit(_evaluate_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    if stop_event and stop_event.is_set():
+                        for f in futures:
+                            f.cancel()
+                        break
+                    try:
+                        chunk_results = future.result()
+                    except BrokenProcessPool as e:
+                        # 有 worker 进程异常退出时其余未完成的任务块都会失败，只提示一次
+                        failed_chunks += 1
+                        if not pool_broken:
+                            pool_broken = True
+                            _log(log_queue, f'工作进程异常退出，未完成的任务块无法继续: {e}')
+                        continue
+                    except Exception as e:
+                        # 某个任务块失败（如 worker 进程崩溃）不中止整个批次，未完成的组合留待断点续跑
+                        failed_chunks += 1
+                        _log(log_queue, f'任务块执行失败: {type(e).__name__}: {e}')
+                        continue
+                    for params, stats in chunk_results:
+                        collect(params, stats)
+        elif todo:
+            module = importlib.import_module(space.logic_module)
+            evaluate_func = getattr(module, evaluate_name)
+            df = load_ohlcv(cleaned_path, dtype)
+            cache = IndicatorCache(space, module, df)
+            splitter = PeriodSplitter(df.index, period) if period else None
+            for params in todo:
+                if stop_event and stop_event.is_set():
+                    break
+                try:
+                    stats = _evaluate(evaluate_func, cache, df, params, splitter, robustness_top > 0)
+                except Exception as e:
+                    _log(log_queue, f'回测出错: {params} - {e}')
+                    stats = None
+                collect(params, stats)
+    finally:
+        ckpt.close()
+        if store:
+            store.close()
+
+    if stop_event and stop_event.is_set():
+        _log(log_queue, f'批量回测被中止。已完成 {count}/{total}，用相同参数再次运行可从断点继续。')
+        return None
+    if failed_chunks:
+        _log(log_queue, f'{failed_chunks} 个任务块执行失败，已完成 {count}/{total}。'
+                        '用相同参数再次运行可从断点继续，只补跑未完成的组合。')
+        return None
+
+    output_path = None
+    if results and save_summary:
+        output_path = save_grid_summary(results, space.names, log_queue)
+        if robustness_top > 0:
+            save_robustness_summary([row for _, _, row in top_returns], space.names, robustness_top,
+                                    robustness_metric, robustness_sims, robustness_method, log_queue)
+        if period:
+            save_period_summary(results, space.names, period_rank, log_queue)
+    else:
+        _log(log_queue, '没有有效的回测结果。')
+    os.remove(ckpt_path)
+    return output_path
+
+
+def run_single(
+    strategy: Union[str, ParamSpace],
+    csv_name: str,
+    *values,
+    dtype: str = 'float64',
+    period: Optional[Union[str, List[str]]] = None,
+    stop_event: Optional[threading.Event] = None,
+    log_queue: Optional[queue.Queue] = None,
+    **kwargs
+) -> Optional[pd.Series]:
+    """
+    通用单次回测：按参数声明顺序传入参数值，返回统计结果。
+    供没有自己实现 single_run_func 的策略使用；plot / save_trades 等额外选项会被忽略。
+    period 给出时附带分时段稳定性指标，并在日志中列出各时段收益。
+    """
+    space = _resolve_space(strategy)
+    params = {n: space.cast(n, v) for n, v in zip(space.names, values)}
+    _log(log_queue, '开始处理: ' + ', '.join(f'{k}={v}' for k, v in params.items()))
+    cleaned_path = prepare_cleaned_csv(csv_name, stop_event, log_queue)
+    if cleaned_path is None or (stop_event and stop_event.is_set()):
+        return None
+
+    module = importlib.import_module(space.logic_module)
+    df = load_ohlcv(cleaned_path, dtype)
+    splitter = PeriodSplitter(df.index, period) if period else None
+    stats = _evaluate(getattr(module, space.config['evaluate_func']), IndicatorCache(space, module, df), df, params, splitter)
+    if stats is None:
+        return None
+    if stats.get('_period_returns'):
+        _log(log_queue, '各时段收益 [%]:\n' + pd.Series(stats['_period_returns']).round(2).to_string())
+    return pd.Series({k: v for k, v in stats.items() if not str(k).startswith('_')})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按 config.json 中声明的参数空间执行范围回测')
+    parser.add_argument('strategy', help='策略名，例如 EMA_2ATR')
+    parser.add_argument('csv', help='data/no 下的数据文件名（不含扩展名）')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=RANGE',
+                        help='参数范围，例如 ema_period=10-50 或 atr1=1,1.5,2；未给出的参数使用配置中的默认范围')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--dtype', default='float64', choices=['float64', 'float32'])
+    parser.add_argument('--no-resume', action='store_true', help='忽略已有断点，重新开始')
+    parser.add_argument('--fast', action='store_true', help='使用策略配置的 fast_evaluate_func（快速撮合内核）')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    parser.add_argument('--robustness-top', type=int, default=0)
+    parser.add_argument('--period', help="分时段稳定性统计: M / Q / Y / W / D、等长窗口如 10D，或逗号分隔的分界日期")
+    parser.add_argument('--period-rank', default='Period Stability', help='分时段收益表的排序指标')
+    args = parser.parse_args()
+
+    space = ParamSpace.from_config(args.strategy)
+    texts = {p['name']: p['range'] for p in space.params}
+    for item in args.set:
+        name, text = item.split('=', 1)
+        texts[name.strip()] = text
+    values = {n: space.parse_values(n, texts[n]) for n in space.names}
+    period = args.period.split(',') if args.period and ',' in args.period else args.period
+    run_sweep(space, args.csv, values, workers=args.workers, dtype=args.dtype, resume=not args.no_resume,
+              fast=args.fast, period=period, period_rank=args.period_rank,
+              store_path=args.db, robustness_top=args.robustness_top)
+
+
+if __name__ == '__main__':
+    main()